@@ -0,0 +1,123 @@
+import time
+from typing import Dict
+
+import numpy as np
+import torch
+
+from src.main.data import canonicalize_key, transpose
+from src.main.evaluation import compute_accuracy, get_similarity, load_model
+from src.main.index import encode_windows
+from src.main.model import MidiBert
+from src.main.util import load_mono_midi_trans_dataset
+
+# the number of transposed copies of each window stored by the augmentation-only catalogue
+NUM_TRANSPOSED_VARIANTS: int = 11
+
+
+def _top_k_songs(queries: np.ndarray, catalogue: np.ndarray, num_variants: int, k: int) -> torch.Tensor:
+    """
+    Ranks the songs of a catalogue storing a fixed number of variants of each
+    song, where the similarity of a song is the similarity of its closest
+    variant.
+    :param queries: the query vectors
+    :param catalogue: the catalogue vectors, with the variants of each song
+    stored next to each other
+    :param num_variants: the number of variants of each song
+    :param k: the number of retrieved songs
+    :return: the indices of the top k songs of each query
+    """
+    similarity = get_similarity(torch.tensor(queries), torch.tensor(catalogue)).T
+    song_similarity = similarity.reshape(len(queries), -1, num_variants).max(dim=2).values
+    return torch.argsort(song_similarity, dim=1, descending=True)[:, :k]
+
+
+def evaluate_baseline(model: MidiBert, queries: np.ndarray, targets: np.ndarray, k: int = 5) -> Dict[str, float]:
+    """
+    Evaluates the current catalogue, which stores one vector per target
+    window encoded in its original key, as in evaluation.evaluate.
+    :param model: the encoder
+    :param queries: the query windows
+    :param targets: the target windows
+    :param k: the number of retrieved songs
+    :return: the catalogue size, catalogue encode time and recall@k
+    """
+    start = time.perf_counter()
+    catalogue = encode_windows(model, targets, device=device)
+    encode_time = time.perf_counter() - start
+    top_k = _top_k_songs(encode_windows(model, queries, device=device), catalogue, 1, k)
+    return {"num_vectors": len(catalogue), "bytes": catalogue.nbytes, "encode_time": encode_time,
+            "recall": compute_accuracy(top_k)}
+
+
+def evaluate_augmentation(model: MidiBert, queries: np.ndarray, targets: np.ndarray, k: int = 5) -> Dict[str, float]:
+    """
+    Evaluates a catalogue which stores each target alongside transposed
+    copies of it, so that queries in any key have a close match.
+    :param model: the encoder
+    :param queries: the query windows
+    :param targets: the target windows
+    :param k: the number of retrieved songs
+    :return: the catalogue size, catalogue encode time and recall@k
+    """
+    start = time.perf_counter()
+    variants = np.array([
+        transpose(target, shift) for target in targets for shift in range(NUM_TRANSPOSED_VARIANTS + 1)
+    ])
+    catalogue = encode_windows(model, variants, device=device)
+    encode_time = time.perf_counter() - start
+    top_k = _top_k_songs(encode_windows(model, queries, device=device), catalogue, NUM_TRANSPOSED_VARIANTS + 1, k)
+    return {"num_vectors": len(catalogue), "bytes": catalogue.nbytes, "encode_time": encode_time,
+            "recall": compute_accuracy(top_k)}
+
+
+def evaluate_canonicalization(
+        model: MidiBert, queries: np.ndarray, targets: np.ndarray, k: int = 5
+) -> Dict[str, float]:
+    """
+    Evaluates a catalogue which stores one vector per target window, where
+    both targets and queries are transposed into their canonical key before
+    encoding.
+    :param model: the encoder
+    :param queries: the query windows
+    :param targets: the target windows
+    :param k: the number of retrieved songs
+    :return: the catalogue size, catalogue encode time and recall@k
+    """
+    start = time.perf_counter()
+    canonical_targets = np.array([canonicalize_key(target) for target in targets])
+    catalogue = encode_windows(model, canonical_targets, device=device)
+    encode_time = time.perf_counter() - start
+    canonical_queries = np.array([canonicalize_key(query) for query in queries])
+    top_k = _top_k_songs(encode_windows(model, canonical_queries, device=device), catalogue, 1, k)
+    return {"num_vectors": len(catalogue), "bytes": catalogue.nbytes, "encode_time": encode_time,
+            "recall": compute_accuracy(top_k)}
+
+
+def main():
+    k = 5
+    artifact_name = "midibert-ckpt-10"
+    model = load_model(artifact_name)
+    model.to(device)
+    model.eval()
+    eval_tensors = load_mono_midi_trans_dataset("validation")
+    eval_tensors = eval_tensors.view(-1, 2, *eval_tensors.size()[1:]).numpy()
+    targets, queries = eval_tensors[:, 0], eval_tensors[:, 1]
+    for name, evaluate in [
+        ("baseline", evaluate_baseline), ("augmentation", evaluate_augmentation),
+        ("canonical", evaluate_canonicalization)
+    ]:
+        report = evaluate(model, queries, targets, k)
+        print(
+            f"{name}: {report['num_vectors']} vectors ({report['bytes']} bytes), "
+            f"encoded in {report['encode_time']:.1f}s, top {k} accuracy = {report['recall']}"
+        )
+
+
+if __name__ == "__main__":
+    if torch.backends.mps.is_available():
+        device = torch.device("mps")
+    elif torch.cuda.is_available():
+        device = torch.device("cuda:0")
+    else:
+        device = torch.device("cpu")
+    main()
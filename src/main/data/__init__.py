@@ -1,2 +1,6 @@
 from src.main.data.augment import add_accidentals, get_random_transposition, split_to_length
-from src.main.data.preprocess import get_bar_of_tick, get_position_of_tick, midi_to_tuple, preprocess_midi, pad
+from src.main.data.preprocess import (
+    get_bar_of_tick, get_position_of_tick, midi_to_tuple, midi_to_tuple_fast, midi_to_windows, preprocess_midi, pad
+)
+from src.main.data.canonical import canonicalize_key, estimate_tonic, transpose
+from src.main.data.dedup import deduplicate
@@ -0,0 +1,83 @@
+import numpy as np
+
+from src.main.data.augment import MAX_MIDI_PITCH, MIN_MIDI_PITCH
+from src.main.data.preprocess import MIDIBERT_PITCH_OFFSET, PITCH_PAD_TOKEN
+
+NUM_PITCH_CLASSES: int = 12
+# Krumhansl-Kessler key profiles, starting from the tonic
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+# the number of semitones from a minor key's tonic to its relative major's tonic
+RELATIVE_MAJOR_SHIFT: int = 3
+# canonical sequences have their tonic on middle C (MIDI pitch 60), after subtracting the offset
+REFERENCE_PITCH: int = 60 - MIDIBERT_PITCH_OFFSET
+
+
+def estimate_tonic(midi_sequence: np.ndarray) -> int:
+    """
+    Estimates the tonic of a midi sequence by correlating its duration
+    weighted pitch class histogram with the major and minor key profiles.
+    Minor keys are mapped to their relative major, since both share the same
+    notes. Transposing a sequence shifts its tonic by the same amount.
+    :param midi_sequence: a midi sequence, which may contain padding
+    :return: the pitch class of the tonic, where 0 is C
+    """
+    notes = midi_sequence[midi_sequence[:, 2] != PITCH_PAD_TOKEN]
+    pitch_classes = (notes[:, 2].astype(int) + MIDIBERT_PITCH_OFFSET) % NUM_PITCH_CLASSES
+    histogram = np.bincount(pitch_classes, weights=notes[:, 3] + 1, minlength=NUM_PITCH_CLASSES)
+    best_tonic, best_score = 0, -np.inf
+    for tonic in range(NUM_PITCH_CLASSES):
+        rotated = np.roll(histogram, -tonic)
+        for profile, shift in [(MAJOR_PROFILE, 0), (MINOR_PROFILE, RELATIVE_MAJOR_SHIFT)]:
+            score = np.corrcoef(rotated, profile)[0, 1] if np.std(rotated) > 0 else 0
+            if score > best_score:
+                best_tonic, best_score = (tonic + shift) % NUM_PITCH_CLASSES, score
+    return best_tonic
+
+
+def _fold_pitches(pitches: np.ndarray) -> np.ndarray:
+    pitches = np.where(pitches < MIN_MIDI_PITCH, pitches + 12 * np.ceil((MIN_MIDI_PITCH - pitches) / 12), pitches)
+    return np.where(pitches > MAX_MIDI_PITCH, pitches - 12 * np.ceil((pitches - MAX_MIDI_PITCH) / 12), pitches)
+
+
+def _shift_pitches(midi_sequence: np.ndarray, shift: int) -> np.ndarray:
+    """
+    Shifts every pitch of a midi sequence, folding pitches that leave the
+    MidiBERT pitch range back by whole octaves. Padding is left unchanged.
+    """
+    shifted_sequence = midi_sequence.copy()
+    notes = midi_sequence[:, 2] != PITCH_PAD_TOKEN
+    shifted_sequence[notes, 2] = _fold_pitches(midi_sequence[notes, 2] + shift)
+    return shifted_sequence
+
+
+def canonicalize_key(midi_sequence: np.ndarray, reference_pitch: int = REFERENCE_PITCH) -> np.ndarray:
+    """
+    Transposes a midi sequence into a canonical key, so that a sequence and
+    all of its transpositions have the same canonical form. The tonic is
+    moved to the pitch class of the reference pitch, in the octave which puts
+    the mean pitch closest to the reference pitch. Pitches that leave the
+    MidiBERT pitch range are folded back by whole octaves.
+    :param midi_sequence: a midi sequence, which may contain padding
+    :param reference_pitch: the (MidiBERT) pitch that the tonic is moved to
+    :return: the canonical midi sequence
+    """
+    notes = midi_sequence[:, 2] != PITCH_PAD_TOKEN
+    if not any(notes):
+        return midi_sequence.copy()
+    reference_class = (reference_pitch + MIDIBERT_PITCH_OFFSET) % NUM_PITCH_CLASSES
+    shift = (reference_class - estimate_tonic(midi_sequence)) % NUM_PITCH_CLASSES
+    mean_pitch = midi_sequence[notes, 2].mean() + shift
+    shift += 12 * round((reference_pitch - mean_pitch) / 12)
+    return _shift_pitches(midi_sequence, shift)
+
+
+def transpose(midi_sequence: np.ndarray, shift: int) -> np.ndarray:
+    """
+    Transposes a midi sequence by a given number of semitones, folding pitches
+    that leave the MidiBERT pitch range back by whole octaves.
+    :param midi_sequence: a midi sequence, which may contain padding
+    :param shift: the number of semitones
+    :return: the transposed midi sequence
+    """
+    return _shift_pitches(midi_sequence, shift)
@@ -0,0 +1,132 @@
+import hashlib
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+# the number of consecutive notes in each shingle
+SHINGLE_SIZE: int = 4
+NUM_PERMUTATIONS: int = 64
+NUM_BANDS: int = 16
+# the minimum estimated Jaccard similarity of two near-duplicate windows
+NEAR_DUPLICATE_THRESHOLD: float = 0.8
+# a Mersenne prime used for the MinHash permutations
+MINHASH_PRIME: int = (1 << 31) - 1
+
+
+def hash_sequence(midi_sequence: np.ndarray) -> str:
+    """
+    Computes a hash of the exact compound words of a midi sequence.
+    :param midi_sequence: a midi sequence
+    :return: the hex digest of the sequence
+    """
+    words = np.ascontiguousarray(midi_sequence, dtype=np.int32)
+    return hashlib.sha1(words.tobytes()).hexdigest()
+
+
+def get_shingles(midi_sequence: np.ndarray, shingle_size: int = SHINGLE_SIZE) -> Set[int]:
+    """
+    Converts a midi sequence into a set of shingles, where each shingle is
+    a run of consecutive notes described by their pitch intervals, positions
+    and durations. Since intervals are used instead of pitches, a sequence
+    and its transpositions have the same shingles.
+    :param midi_sequence: a midi sequence
+    :param shingle_size: the number of consecutive notes in each shingle
+    :return: the hashed shingles of the sequence
+    """
+    intervals = np.diff(midi_sequence[:, 2].astype(int), prepend=midi_sequence[0, 2])
+    tokens = list(zip(intervals.tolist(), midi_sequence[:, 1].astype(int).tolist(),
+                      midi_sequence[:, 3].astype(int).tolist()))
+    if len(tokens) <= shingle_size:
+        return {hash(tuple(tokens))}
+    return {hash(tuple(tokens[i:i + shingle_size])) for i in range(len(tokens) - shingle_size + 1)}
+
+
+def get_minhash_signature(shingles: Set[int], num_permutations: int = NUM_PERMUTATIONS, seed: int = 0) -> np.ndarray:
+    """
+    Computes the MinHash signature of a set of shingles. The fraction of equal
+    values in two signatures estimates the Jaccard similarity of the sets.
+    :param shingles: the hashed shingles
+    :param num_permutations: the length of the signature
+    :param seed: the seed of the random permutations, which must be the same
+    for all compared signatures
+    :return: the signature
+    """
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, MINHASH_PRIME, size=(num_permutations, 1), dtype=np.int64)
+    b = rng.randint(0, MINHASH_PRIME, size=(num_permutations, 1), dtype=np.int64)
+    values = np.array([shingle % MINHASH_PRIME for shingle in shingles], dtype=np.int64)
+    return ((a * values + b) % MINHASH_PRIME).min(axis=1)
+
+
+def _find(parents: List[int], i: int) -> int:
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def cluster_duplicates(
+        midi_sequences: List[np.ndarray], threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        num_permutations: int = NUM_PERMUTATIONS, num_bands: int = NUM_BANDS
+) -> Tuple[List[int], int]:
+    """
+    Groups midi sequences which are exact or near duplicates of each other.
+    Exact duplicates are found by hashing the compound words. Near duplicates
+    are found by comparing MinHash signatures of the shingles of each
+    sequence, where only sequences sharing a band of their signature (LSH)
+    are compared.
+    :param midi_sequences: the midi sequences
+    :param threshold: the minimum estimated Jaccard similarity of near
+    duplicates
+    :param num_permutations: the length of each MinHash signature
+    :param num_bands: the number of LSH bands, which must divide the
+    signature length
+    :return: the index of the first sequence of each sequence's cluster, and
+    the number of exact duplicates
+    """
+    parents = list(range(len(midi_sequences)))
+    first_by_hash = {}
+    num_exact_duplicates = 0
+    for i, sequence in enumerate(midi_sequences):
+        sequence_hash = hash_sequence(sequence)
+        if sequence_hash in first_by_hash:
+            parents[i] = first_by_hash[sequence_hash]
+            num_exact_duplicates += 1
+        else:
+            first_by_hash[sequence_hash] = i
+    # near duplicates only need to be found among the remaining sequences
+    unique = list(first_by_hash.values())
+    signatures = {i: get_minhash_signature(get_shingles(midi_sequences[i]), num_permutations) for i in tqdm(unique)}
+    rows = num_permutations // num_bands
+    for band in range(num_bands):
+        buckets = {}
+        for i in unique:
+            buckets.setdefault(signatures[i][band * rows:(band + 1) * rows].tobytes(), []).append(i)
+        for bucket in buckets.values():
+            for j in bucket[1:]:
+                root_i, root_j = _find(parents, bucket[0]), _find(parents, j)
+                if root_i != root_j and np.mean(signatures[bucket[0]] == signatures[j]) >= threshold:
+                    parents[max(root_i, root_j)] = min(root_i, root_j)
+    return [_find(parents, i) for i in range(len(midi_sequences))], num_exact_duplicates
+
+
+def deduplicate(
+        midi_sequences: List[np.ndarray], threshold: float = NEAR_DUPLICATE_THRESHOLD
+) -> Tuple[List[np.ndarray], Dict[str, int]]:
+    """
+    Removes exact and near duplicate midi sequences, keeping the first
+    sequence of each cluster of duplicates.
+    :param midi_sequences: the midi sequences
+    :param threshold: the minimum estimated Jaccard similarity of near
+    duplicates
+    :return: the remaining sequences, and the number of sequences, exact
+    duplicates and near duplicates
+    """
+    clusters, num_exact_duplicates = cluster_duplicates(midi_sequences, threshold)
+    kept_sequences = [sequence for i, sequence in enumerate(midi_sequences) if clusters[i] == i]
+    return kept_sequences, {
+        "num_sequences": len(midi_sequences),
+        "exact_duplicates": num_exact_duplicates,
+        "near_duplicates": len(midi_sequences) - len(kept_sequences) - num_exact_duplicates
+    }
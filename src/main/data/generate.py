@@ -5,7 +5,9 @@ import numpy as np
 import torch
 from tqdm import tqdm
 
-from src.main.data import add_accidentals, get_random_transposition, pad, preprocess_midi, split_to_length
+from src.main.data import (
+    add_accidentals, canonicalize_key, deduplicate, get_random_transposition, pad, preprocess_midi, split_to_length
+)
 from src.main.util import root_dir
 
 MAX_BERT_SEQ_LENGTH: int = 512
@@ -53,6 +55,15 @@ def _add_accidentals(midi_sequences: List[np.ndarray], num_accidentals: int = 1)
     return augmented_sequences
 
 
+def _canonicalize_keys(midi_sequences: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Transposes each input sequence into its canonical key.
+    :param midi_sequences: the original MIDI sequences
+    :return: the canonical MIDI sequences
+    """
+    return [canonicalize_key(sequence) for sequence in tqdm(midi_sequences)]
+
+
 def _shuffle_pairs(midi_sequences: np.ndarray, samples_per_track: int) -> np.ndarray:
     """
     Shuffles all midi sequences belonging to the same original midi file.
@@ -66,28 +77,51 @@ def _shuffle_pairs(midi_sequences: np.ndarray, samples_per_track: int) -> np.nda
     return batched_sequences.reshape((-1, *midi_sequences.shape[1:]))
 
 
-def generate_mono_midi_dataset(split_name: str = "train") -> np.ndarray:
+def generate_mono_midi_dataset(
+        split_name: str = "train", canonicalize: bool = False, remove_duplicates: bool = True
+) -> np.ndarray:
     """
     Generates the mono-midi-transposition-dataset into the MidiBERT format,
     with sequences trimmed to meet size restrictions, and transpositions added
     to augment the dataset.
     :param split_name: the data split (i.e. train, validation, evaluation)
+    :param canonicalize: if true, transposes every sequence into its
+    canonical key before augmentation. Since a sequence and its
+    transpositions share a canonical key, each pair then differs by added
+    accidentals instead of a transposition.
+    :param remove_duplicates: if true, removes exact and near duplicate
+    sequences before augmentation
     :return: the dataset represented by a numpy array
     """
     num_transpositions = 1  # should be 1 for validation and evaluation
     num_accidentals = 0  # should be 0 for validation and evaluation
+    if canonicalize:
+        num_transpositions = 0
+        num_accidentals = 1
     midi_dir = join(root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", split_name, "midi")
     print(f"Loading data from path ${midi_dir}.")
     midi_sequences = preprocess_midi(midi_dir)
     print("Splitting dataset.")
     split_midi_sequences = _split_sequences(midi_sequences)
+    samples_per_track = (num_transpositions + 1) * (num_accidentals + 1)
+    if remove_duplicates:
+        print("Removing duplicates.")
+        split_midi_sequences, report = deduplicate(split_midi_sequences)
+        num_removed = report["exact_duplicates"] + report["near_duplicates"]
+        print(
+            f"Removed {report['exact_duplicates']} exact and {report['near_duplicates']} near duplicates out of "
+            f"{report['num_sequences']} sequences ({num_removed / max(report['num_sequences'], 1):.1%}), "
+            f"saving {num_removed * samples_per_track} augmented sequences."
+        )
+    if canonicalize:
+        print("Canonicalizing keys.")
+        split_midi_sequences = _canonicalize_keys(split_midi_sequences)
     print("Augmenting dataset.")
     aug_midi_sequences = _add_transpositions(split_midi_sequences, num_transpositions)
     aug_midi_sequences = _add_accidentals(aug_midi_sequences, num_accidentals)
     print("Padding dataset.")
     padded_sequences = pad(aug_midi_sequences)
     print("Shuffling pairs.")
-    samples_per_track = (num_transpositions + 1) * (num_accidentals + 1)
     padded_sequences = _shuffle_pairs(padded_sequences, samples_per_track)
     print(len(padded_sequences))
     return padded_sequences
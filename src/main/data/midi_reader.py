@@ -0,0 +1,123 @@
+from typing import Iterator, List, Tuple
+
+# kinds of events yielded by iter_track_events
+NOTE_OFF: int = 0
+NOTE_ON: int = 1
+PROGRAM_CHANGE: int = 2
+TIME_SIGNATURE: int = 3
+TRACK_END: int = 4
+# number of data bytes following each status byte, for non-channel messages
+SYSTEM_DATA_LENGTHS = {0xf1: 1, 0xf2: 2, 0xf3: 1, 0xf6: 0, 0xf8: 0, 0xfa: 0, 0xfb: 0, 0xfc: 0, 0xfe: 0}
+META_STATUS: int = 0xff
+META_TIME_SIGNATURE: int = 0x58
+
+
+def _read_chunk_header(data: bytes, offset: int) -> Tuple[bytes, int]:
+    if offset + 8 > len(data):
+        raise ValueError("Unexpected end of MIDI file.")
+    return data[offset:offset + 4], int.from_bytes(data[offset + 4:offset + 8], "big")
+
+
+def read_midi_tracks(file_path: str) -> Tuple[int, List[bytes]]:
+    """
+    Reads the raw track chunks of a standard MIDI file, without decoding any
+    events.
+    :param file_path: a MIDI file
+    :return: the number of ticks per quarter note, and the raw event data of
+    each track
+    :raise ValueError: if the file is not a valid MIDI file
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    name, size = _read_chunk_header(data, 0)
+    if name != b"MThd" or size < 6 or len(data) < 8 + size:
+        raise ValueError(f"{file_path} is not a MIDI file.")
+    num_tracks = int.from_bytes(data[10:12], "big")
+    ticks_per_beat = int.from_bytes(data[12:14], "big", signed=True)
+    if ticks_per_beat <= 0:
+        raise ValueError("SMPTE time division is not supported.")
+    offset = 8 + size
+    tracks = []
+    for _ in range(num_tracks):
+        name, size = _read_chunk_header(data, offset)
+        if name != b"MTrk":
+            raise ValueError("No MTrk header at start of track.")
+        if offset + 8 + size > len(data):
+            raise ValueError("Unexpected end of MIDI file.")
+        tracks.append(data[offset + 8:offset + 8 + size])
+        offset += 8 + size
+    return ticks_per_beat, tracks
+
+
+def iter_track_events(track: bytes) -> Iterator[Tuple[int, int, int, int, int]]:
+    """
+    Decodes the events of a raw track chunk which are needed to read notes,
+    skipping every other event. Each event is a tuple of the form:
+    (tick, kind, channel, data1, data2)
+    Note events have the pitch and velocity as data, program changes have the
+    program, and time signatures have the numerator and denominator. The last
+    event is always a TRACK_END event at the tick of the final event.
+    :param track: the raw event data of a track
+    :return: an iterator over the decoded events, with absolute times in ticks
+    :raise ValueError: if the track is malformed
+    """
+    tick = 0
+    offset = 0
+    last_status = None
+    end = len(track)
+    try:
+        while offset < end:
+            # variable length delta time
+            byte = track[offset]
+            offset += 1
+            delta = byte & 0x7f
+            while byte & 0x80:
+                byte = track[offset]
+                offset += 1
+                delta = (delta << 7) | (byte & 0x7f)
+            tick += delta
+            status = track[offset]
+            if status < 0x80:
+                # running status, the status byte is the first data byte
+                if last_status is None:
+                    raise ValueError("Running status without last status.")
+                status = last_status
+            else:
+                offset += 1
+                if status != META_STATUS:
+                    last_status = status
+            if status == META_STATUS or status == 0xf0 or status == 0xf7:
+                meta_type = -1
+                if status == META_STATUS:
+                    meta_type = track[offset]
+                    offset += 1
+                byte = track[offset]
+                offset += 1
+                length = byte & 0x7f
+                while byte & 0x80:
+                    byte = track[offset]
+                    offset += 1
+                    length = (length << 7) | (byte & 0x7f)
+                if meta_type == META_TIME_SIGNATURE:
+                    yield tick, TIME_SIGNATURE, -1, track[offset], 2 ** track[offset + 1]
+                offset += length
+                continue
+            kind = status & 0xf0
+            if kind == 0xc0:
+                yield tick, PROGRAM_CHANGE, status & 0x0f, track[offset], 0
+                offset += 1
+            elif kind == 0xd0:
+                offset += 1
+            elif kind == 0xf0:
+                if status not in SYSTEM_DATA_LENGTHS:
+                    raise ValueError(f"Undefined status byte {status:#04x}.")
+                offset += SYSTEM_DATA_LENGTHS[status]
+            else:
+                if kind == 0x90:
+                    yield tick, NOTE_ON, status & 0x0f, track[offset], track[offset + 1]
+                elif kind == 0x80:
+                    yield tick, NOTE_OFF, status & 0x0f, track[offset], track[offset + 1]
+                offset += 2
+    except IndexError:
+        raise ValueError("Unexpected end of MIDI track.")
+    yield tick, TRACK_END, -1, 0, 0
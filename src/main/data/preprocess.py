@@ -1,4 +1,5 @@
 import math
+from bisect import bisect_right
 from os import walk
 from os.path import join
 from typing import List, Tuple
@@ -7,6 +8,11 @@ import numpy as np
 from pretty_midi import PrettyMIDI, TimeSignature
 from tqdm import tqdm
 
+from src.main.data.augment import MAX_BERT_SEQ_LEN, split_to_length
+from src.main.data.midi_reader import (
+    NOTE_OFF, NOTE_ON, PROGRAM_CHANGE, TIME_SIGNATURE, TRACK_END, iter_track_events, read_midi_tracks
+)
+
 NUM_CLASSES: int = 4
 BAR_PAD_TOKEN: int = 2
 POSITION_PAD_TOKEN: int = 16
@@ -23,6 +29,10 @@ MAX_MIDIBERT_DURATION: int = 63
 # MidiBERT sub-beat division values
 NUM_POSITION_SUB_BEATS: int = 16
 NUM_DURATION_SUB_BEATS: int = 16
+# the MIDI channel reserved for drums
+DRUM_CHANNEL: int = 9
+# the largest tick allowed before a MIDI file is considered corrupt, as in PrettyMIDI
+MAX_TICK: int = 10000000
 
 
 def _time_signature_has_changed(time_sig_changes: List[TimeSignature], current_time: float) -> bool:
@@ -68,10 +78,7 @@ def get_bar_of_tick(current_tick: float, bar_to_ticks: List[float]) -> int:
     :param bar_to_ticks: the tick values at the start of each bar
     :return: the bar corresponding to the current_ticks value
     """
-    for i in range(len(bar_to_ticks)):
-        if bar_to_ticks[i] > current_tick:
-            return i
-    return len(bar_to_ticks)
+    return bisect_right(bar_to_ticks, current_tick)
 
 
 def get_position_of_tick(current_tick: float, bar_number: int, bar_to_ticks: List[float]) -> int:
@@ -125,6 +132,152 @@ def midi_to_tuple(file_path) -> List[Tuple[int, float, int, float]]:
     return words
 
 
+def _get_bar_to_ticks_array_from_ticks(
+        time_sig_changes: List[Tuple[int, int, int]], resolution: int, max_tick: int
+) -> List[float]:
+    """
+    Creates an array where the i-th entry corresponds to the tick value at the
+    start of the i-th bar, using time signature changes given in ticks. The
+    array always extends past the given maximum tick.
+    :param time_sig_changes: the (tick, numerator, denominator) of each time
+    signature change, sorted by tick
+    :param resolution: the number of ticks per quarter note
+    :param max_tick: the largest tick which must be covered
+    :return: the number of ticks at the start of each bar
+    """
+    current_tick = 0
+    current_time_sig = (4, 4)
+    change_idx = 0
+    bar_ticks = [0]
+    while current_tick <= max_tick:
+        while change_idx < len(time_sig_changes) and current_tick >= time_sig_changes[change_idx][0]:
+            current_time_sig = time_sig_changes[change_idx][1:]
+            change_idx += 1
+        num_quarter_notes_per_bar = (current_time_sig[0] / current_time_sig[1]) * 4
+        current_tick += num_quarter_notes_per_bar * resolution
+        bar_ticks.append(current_tick)
+    return bar_ticks
+
+
+def _is_valid_note(start: int, end: int, pitch: int, resolution: int) -> bool:
+    """
+    Checks if a single note is compatible with MidiBERTs input format.
+    :param start: the start tick of the note
+    :param end: the end tick of the note
+    :param pitch: the MIDI pitch of the note
+    :param resolution: the number of ticks per quarter note
+    :return: true iff the pitch and duration are allowed by MidiBERT
+    """
+    duration = round((end - start) / resolution * NUM_DURATION_SUB_BEATS)
+    return MIN_MIDIBERT_PITCH <= pitch - MIDIBERT_PITCH_OFFSET <= MAX_MIDIBERT_PITCH \
+        and duration <= MAX_MIDIBERT_DURATION
+
+
+def _read_notes(
+        file_path: str, track: int = 0, merge_tracks: bool = False
+) -> Tuple[int, List[Tuple[int, int, int]], List[Tuple[int, int, int]]]:
+    """
+    Reads the notes of an instrument track from the raw events of a MIDI
+    file, in ticks. Notes are grouped into instruments and paired the same
+    way as PrettyMIDI, so instrument track i corresponds to
+    PrettyMIDI.instruments[i]. Reading stops as soon as a selected note is not
+    a valid MidiBERT input.
+    :param file_path: a MIDI file
+    :param track: the index of the instrument track to read
+    :param merge_tracks: if true, merges the notes of all non-drum instrument
+    tracks in order of their start tick
+    :return: the number of ticks per quarter note, the (start, end, pitch) of
+    each note, and the (tick, numerator, denominator) of each time signature
+    change. The notes are empty if the selection has an invalid note.
+    :raise ValueError: if the file is not a valid MIDI file
+    """
+    resolution, tracks = read_midi_tracks(file_path)
+    instruments = {}
+    time_sig_changes = []
+    max_tick = 0
+    for track_idx, track_data in enumerate(tracks):
+        # open notes for each (channel, pitch), and the program of each channel
+        last_note_on = {}
+        current_program = [0] * 16
+        for tick, kind, channel, data1, data2 in iter_track_events(track_data):
+            if kind == NOTE_ON and data2 > 0:
+                last_note_on.setdefault((channel, data1), []).append(tick)
+            elif kind == NOTE_OFF or kind == NOTE_ON:
+                key = (channel, data1)
+                if key not in last_note_on:
+                    continue
+                # one note-off closes every open note which did not start on
+                # the same tick
+                open_notes = last_note_on[key]
+                notes_to_close = [start_tick for start_tick in open_notes if start_tick != tick]
+                notes_to_keep = [start_tick for start_tick in open_notes if start_tick == tick]
+                if notes_to_close:
+                    instrument_key = (current_program[channel], channel, track_idx)
+                    notes = instruments.setdefault(instrument_key, [])
+                    selected = channel != DRUM_CHANNEL if merge_tracks \
+                        else len(instruments) > track and list(instruments)[track] == instrument_key
+                    for start_tick in notes_to_close:
+                        if selected and not _is_valid_note(start_tick, tick, data1, resolution):
+                            return resolution, [], time_sig_changes
+                        notes.append((start_tick, tick, data1))
+                if notes_to_close and notes_to_keep:
+                    last_note_on[key] = notes_to_keep
+                else:
+                    del last_note_on[key]
+            elif kind == PROGRAM_CHANGE:
+                current_program[channel] = data1
+            elif kind == TIME_SIGNATURE:
+                time_sig_changes.append((tick, data1, data2))
+            elif kind == TRACK_END:
+                max_tick = max(max_tick, tick)
+    if max_tick + 1 > MAX_TICK:
+        raise ValueError(f"MIDI file has a largest tick of {max_tick + 1}, it is likely corrupt")
+    time_sig_changes.sort(key=lambda change: change[0])
+    if merge_tracks:
+        notes = [note for key, notes in instruments.items() if key[1] != DRUM_CHANNEL for note in notes]
+        return resolution, sorted(notes, key=lambda note: (note[0], note[2])), time_sig_changes
+    if track >= len(instruments):
+        return resolution, [], time_sig_changes
+    return resolution, list(instruments.values())[track], time_sig_changes
+
+
+def midi_to_tuple_fast(
+        file_path, track: int = 0, merge_tracks: bool = False
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Converts a MIDI file into a sequence of 4-tuples, where each tuple has
+    the form:
+    (bar, position, pitch, duration)
+    Unlike midi_to_tuple, notes and time signatures are read directly from
+    the raw MIDI events in ticks, without converting every event to seconds
+    and back. Reading stops as soon as a note is found that MidiBERT does not
+    allow, since the sequence would be discarded anyway.
+    :param file_path: a MIDI file
+    :param track: the index of the instrument track to read
+    :param merge_tracks: if true, merges the notes of all non-drum instrument
+    tracks
+    :return: the corresponding sequence of tuples, or an empty sequence if
+    the file cannot be processed or is not a valid MidiBERT input
+    """
+    try:
+        resolution, notes, time_sig_changes = _read_notes(file_path, track, merge_tracks)
+    except ValueError:
+        print(f"Unable to process MIDI file {file_path}")
+        return []
+    if not notes:
+        return []
+    bar_to_ticks = _get_bar_to_ticks_array_from_ticks(time_sig_changes, resolution, max(n[1] for n in notes))
+    words = []
+    prev_bar_number = -1
+    for start, end, pitch in notes:
+        bar_number = get_bar_of_tick(start, bar_to_ticks)
+        position = get_position_of_tick(start, bar_number, bar_to_ticks)
+        duration = round((end - start) / resolution * NUM_DURATION_SUB_BEATS)
+        words.append((_classify_bar(prev_bar_number, bar_number), position, pitch - MIDIBERT_PITCH_OFFSET, duration))
+        prev_bar_number = bar_number
+    return words
+
+
 def _is_valid_sequence(midi_sequence: np.ndarray) -> bool:
     """
     Checks if a given midi sequence is compatible with MidiBERTs input format.
@@ -149,17 +302,19 @@ def _is_valid_sequence(midi_sequence: np.ndarray) -> bool:
     return True
 
 
-def preprocess_midi(midi_dir: str) -> List[np.ndarray]:
+def preprocess_midi(midi_dir: str, fast: bool = True) -> List[np.ndarray]:
     """
     Preprocesses a directory of MIDI files into tuples used for MidiBERT.
     :param midi_dir: a directory of MIDI files
+    :param fast: if true, uses the tick-domain parser midi_to_tuple_fast
     :return: tuple sequences corresponding to each MIDI file
     """
+    parse = midi_to_tuple_fast if fast else midi_to_tuple
     midi_sequences = []
     for root, _, files in walk(midi_dir):
         for file in tqdm(files):
             abs_path = join(root, file)
-            sequence = np.array(midi_to_tuple(abs_path))
+            sequence = np.array(parse(abs_path))
             if _is_valid_sequence(sequence):
                 midi_sequences.append(sequence)
     return midi_sequences
@@ -180,3 +335,18 @@ def pad(midi_sequences: List[np.ndarray], max_length: int = None) -> np.ndarray:
         padding = np.array(PAD_WORD * (max_length - len(seq))).reshape(-1, NUM_CLASSES)
         padded_seqs[i] = np.vstack([seq, padding])
     return padded_seqs
+
+
+def midi_to_windows(file_path: str, max_length: int = MAX_BERT_SEQ_LEN) -> np.ndarray:
+    """
+    Converts a single MIDI file into padded MidiBERT input windows, using the
+    same splitting and padding steps as the dataset generation.
+    :param file_path: a MIDI file
+    :param max_length: the length of each window
+    :return: an array of shape (num_windows, max_length, NUM_CLASSES). The
+    array is empty if the MIDI file is not a valid MidiBERT input.
+    """
+    sequence = np.array(midi_to_tuple_fast(file_path))
+    if not _is_valid_sequence(sequence):
+        return np.zeros(shape=(0, max_length, NUM_CLASSES))
+    return pad(split_to_length(sequence, max_length), max_length)
@@ -0,0 +1,174 @@
+import time
+from os.path import join
+from typing import Dict, List
+
+import torch
+from torch.optim import Adam, Optimizer
+from tqdm import tqdm
+
+from src.main.evaluation import encode_pairs, get_dataloaders as get_eval_dataloader, load_model, recall_at_k
+from src.main.index import VectorIndex, sync_midi_dir
+from src.main.model import MidiBert, MidiBertStudent
+from src.main.train import get_dataloaders
+from src.main.util import (
+    PrefetchLoader, distillation_loss, init_midibert_student, pairwise_loss, root_dir, save_midibert
+)
+
+NUM_EPOCHS: int = 4
+# weight of the pairwise retrieval loss relative to the distillation loss
+PAIRWISE_LOSS_WEIGHT: float = 0.1
+# the maximum drop in recall allowed when querying a teacher index with student vectors
+MAX_COMPATIBILITY_DROP: float = 0.02
+NUM_LATENCY_QUERIES: int = 50
+
+
+def init_student_from_teacher(teacher: MidiBert) -> MidiBertStudent:
+    """
+    Initializes a student encoder, copying the token embeddings of the
+    teacher, which do not depend on the size of the transformer layers.
+    :param teacher: the teacher MidiBERT encoder
+    :return: the student MidiBERT encoder
+    """
+    student = init_midibert_student()
+    student.word_emb.load_state_dict(teacher.word_emb.state_dict())
+    return student
+
+
+def distill(
+        student: MidiBertStudent, teacher: MidiBert, train_loader: PrefetchLoader, val_loader: PrefetchLoader,
+        optimizer: Optimizer
+):
+    teacher.to(device)
+    teacher.eval()
+    student.to(device)
+    train_history = []
+    val_history = []
+    for _ in range(NUM_EPOCHS):
+        student.train()
+        train_loss = 0
+        for original, transpose in tqdm(train_loader):
+            with torch.no_grad():
+                original_target = teacher(original)
+                transpose_target = teacher(transpose)
+
+            optimizer.zero_grad()
+
+            original_vec = student(original)
+            transpose_vec = student(transpose)
+
+            loss = distillation_loss(original_vec, original_target) + distillation_loss(transpose_vec, transpose_target)
+            loss += PAIRWISE_LOSS_WEIGHT * pairwise_loss(original_vec, transpose_vec, device=device)
+            loss.backward()
+
+            optimizer.step()
+
+            train_loss += loss.item()
+        train_history.append(train_loss / len(train_loader))
+
+        student.eval()
+        val_loss = 0
+        with torch.no_grad():
+            for original, transpose in tqdm(val_loader):
+                original_vec = student(original)
+                transpose_vec = student(transpose)
+                loss = distillation_loss(original_vec, teacher(original))
+                loss += distillation_loss(transpose_vec, teacher(transpose))
+                loss += PAIRWISE_LOSS_WEIGHT * pairwise_loss(original_vec, transpose_vec, device=device)
+                val_loss += loss.item()
+        val_history.append(val_loss / len(val_loader))
+
+        print(f"Epoch {len(train_history)}, train-loss={train_history[-1]}, val-loss={val_history[-1]}")
+        save_midibert(student, f"midibert-student-epoch-{len(train_history)}")
+    return train_history, val_history
+
+
+def measure_latency(model: MidiBert, eval_loader: PrefetchLoader, num_queries: int = NUM_LATENCY_QUERIES) -> float:
+    """
+    Measures the median time taken to encode a single query on the CPU.
+    :param model: the encoder
+    :param eval_loader: the evaluation pairs
+    :param num_queries: the number of queries to time
+    :return: the median latency in milliseconds
+    """
+    model.to("cpu")
+    model.eval()
+    queries = []
+    for _, transpose in eval_loader:
+        queries += [query.cpu() for query in transpose]
+        if len(queries) >= num_queries:
+            break
+    queries = queries[:num_queries]
+    latencies = []
+    with torch.no_grad():
+        model(queries[0].unsqueeze(0))  # warm up
+        for query in queries:
+            start = time.perf_counter()
+            model(query.unsqueeze(0))
+            latencies.append(1000 * (time.perf_counter() - start))
+    return sorted(latencies)[len(latencies) // 2]
+
+
+def compare(teacher: MidiBert, student: MidiBertStudent, eval_loader: PrefetchLoader, k: int = 5) -> Dict[str, float]:
+    """
+    Compares the recall@k and query latency of the teacher and student
+    encoders. The compatibility recall uses student queries against teacher
+    targets, i.e. searching an index built by the teacher with the student.
+    :param teacher: the teacher MidiBERT encoder
+    :param student: the student MidiBERT encoder
+    :param eval_loader: the evaluation pairs. Must not be shuffled, since the
+    teacher and student vectors are matched by their order.
+    :param k: the number of retrieved targets
+    :return: the recall and latency of each encoder
+    """
+    teacher_queries, teacher_targets = encode_pairs(teacher, eval_loader, device)
+    student_queries, student_targets = encode_pairs(student, eval_loader, device)
+    return {
+        "teacher_recall": recall_at_k(teacher_queries, teacher_targets, k),
+        "student_recall": recall_at_k(student_queries, student_targets, k),
+        "compatibility_recall": recall_at_k(student_queries, teacher_targets, k),
+        "teacher_latency_ms": measure_latency(teacher, eval_loader),
+        "student_latency_ms": measure_latency(student, eval_loader)
+    }
+
+
+def print_report(report: Dict[str, float], k: int = 5):
+    rows: List[List[str]] = [
+        ["", "teacher", "student"],
+        [f"recall@{k}", f"{report['teacher_recall']:.4f}", f"{report['student_recall']:.4f}"],
+        ["latency (ms)", f"{report['teacher_latency_ms']:.2f}", f"{report['student_latency_ms']:.2f}"]
+    ]
+    for row in rows:
+        print("".join(cell.ljust(16) for cell in row))
+    print(f"Student queries against teacher index: recall@{k} = {report['compatibility_recall']:.4f}")
+
+
+def main():
+    k = 5
+    teacher_artifact_name = "midibert-ckpt-10"
+    teacher = load_model(teacher_artifact_name)
+    student = init_student_from_teacher(teacher)
+    train_loader, val_loader = get_dataloaders(device)
+    optimizer = Adam(student.parameters(), lr=1e-4, betas=(0.9, 0.999))
+    distill(student, teacher, train_loader, val_loader, optimizer)
+    report = compare(teacher, student, get_eval_dataloader("validation", device), k)
+    print_report(report, k)
+    if report["compatibility_recall"] < report["teacher_recall"] - MAX_COMPATIBILITY_DROP:
+        # the student vectors are not interchangeable with the teacher vectors,
+        # so re-encode the catalogue. The index detects the checkpoint change.
+        print("Student is not compatible with the teacher index. Rebuilding index.")
+        split = "train"
+        midi_dir = join(root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", split, "midi")
+        index = VectorIndex(join(root_dir, "artifact", "index", split))
+        summary = sync_midi_dir(index, midi_dir, student, f"midibert-student-epoch-{NUM_EPOCHS}", device=device)
+        print(f"Index rebuilt: {summary}")
+        index.compact()
+
+
+if __name__ == "__main__":
+    if torch.backends.mps.is_available():
+        device = torch.device("mps")
+    elif torch.cuda.is_available():
+        device = torch.device("cuda:0")
+    else:
+        device = torch.device("cpu")
+    main()
@@ -1,14 +1,14 @@
 import pickle
 from os.path import join
+from typing import Tuple
 
 import torch
 import torch.nn.functional as F
-from torch.utils.data import DataLoader, TensorDataset
 from tqdm import tqdm
 from transformers import BertConfig
 
 from src.main.model import MidiBert
-from src.main.util import load_mono_midi_trans_dataset, root_dir
+from src.main.util import PrefetchLoader, load_mono_midi_trans_dataset, root_dir
 
 BATCH_SIZE: int = 16
 
@@ -29,10 +29,10 @@ def load_model(artifact_name: str = "midibert-ckpt-10") -> MidiBert:
     return model
 
 
-def get_dataloaders() -> DataLoader:
-    eval_tensors = load_mono_midi_trans_dataset("train")
+def get_dataloaders(split_name: str = "train", device="cpu") -> PrefetchLoader:
+    eval_tensors = load_mono_midi_trans_dataset(split_name)
     eval_tensors = eval_tensors.view(-1, 2, *eval_tensors.size()[1:])
-    eval_loader = DataLoader(TensorDataset(eval_tensors), batch_size=BATCH_SIZE, shuffle=False)
+    eval_loader = PrefetchLoader(eval_tensors, batch_size=BATCH_SIZE, shuffle=False, device=device)
     return eval_loader
 
 
@@ -50,32 +50,38 @@ def compute_accuracy(top_k: torch.Tensor):
     return accuracy / len(top_k)
 
 
-def evaluate(model: MidiBert, eval_loader: DataLoader, k: int = 5):
+def encode_pairs(model: MidiBert, eval_loader: PrefetchLoader, device="cpu") -> Tuple[torch.Tensor, torch.Tensor]:
     model.to(device)
     model.eval()
     enc_queries = []
     enc_targets = []
     with torch.no_grad():
-        for batch in tqdm(eval_loader):
-            queries = batch[0][:, 1, :, :].to(device)
-            targets = batch[0][:, 0, :, :].to(device)
+        for targets, queries in tqdm(eval_loader):
             queries_vec = model(queries)
             targets_vec = model(targets)
             enc_queries += [q for q in queries_vec]
             enc_targets += [t for t in targets_vec]
-    enc_queries = torch.vstack(enc_queries)
-    enc_targets = torch.vstack(enc_targets)
+    print(f"Mean data wait per step: {1000 * eval_loader.mean_wait_time():.2f}ms")
+    return torch.vstack(enc_queries), torch.vstack(enc_targets)
+
+
+def recall_at_k(enc_queries: torch.Tensor, enc_targets: torch.Tensor, k: int = 5) -> float:
     similarity_matrix = get_similarity(enc_queries, enc_targets)
     top_k = torch.argsort(similarity_matrix, dim=1, descending=True)[:, :k]
     return compute_accuracy(top_k)
 
 
+def evaluate(model: MidiBert, eval_loader: PrefetchLoader, k: int = 5, device="cpu"):
+    enc_queries, enc_targets = encode_pairs(model, eval_loader, device)
+    return recall_at_k(enc_queries, enc_targets, k)
+
+
 def main():
     k = 5
     artifact_name = "midibert-ckpt-10"
     model = load_model(artifact_name)
-    eval_loader = get_dataloaders()
-    accuracy = evaluate(model, eval_loader, k)
+    eval_loader = get_dataloaders(device=device)
+    accuracy = evaluate(model, eval_loader, k, device)
     print(f"Top {k} accuracy = {accuracy}")
 
 
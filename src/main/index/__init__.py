@@ -0,0 +1,3 @@
+from src.main.index.vector_index import VectorIndex, rank_songs
+from src.main.index.sync import encode_windows, hash_file, sync_midi_dir
+from src.main.index.compress import CompressedIndex, EmbeddingCompressor, score_int8, search_int8
@@ -0,0 +1,290 @@
+import json
+import os
+import time
+from os.path import join
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+
+from src.main.evaluation import compute_accuracy, encode_pairs, get_dataloaders, load_model
+from src.main.index.vector_index import VectorIndex, rank_songs
+from src.main.util import root_dir
+
+COMPRESSED_DIM: int = 128
+# the number of int8 vectors converted at once when scoring
+SEARCH_BLOCK_SIZE: int = 4096
+INT8_MAX: int = 127
+CODES_NAME: str = "codes.npz"
+COMPRESSOR_NAME: str = "compressor.npz"
+
+
+class EmbeddingCompressor:
+    """
+    Compresses encoder vectors by projecting them onto their top principal
+    components and storing each dimension as an int8 value with a
+    per-dimension scale. Projected vectors are L2-normalized before
+    quantization, so the dot product of two compressed vectors approximates
+    their cosine similarity.
+    """
+
+    def __init__(self, dim: int = COMPRESSED_DIM, whiten: bool = False):
+        self.dim = dim
+        self.whiten = whiten
+        self.mean = None
+        self.components = None
+        self.scales = None
+
+    def fit(self, vectors: np.ndarray) -> "EmbeddingCompressor":
+        """
+        Learns the projection and quantization scales from a set of vectors,
+        e.g. the training set embeddings.
+        :param vectors: an array of shape (num_vectors, hidden_size)
+        :return: the fitted compressor
+        :raise ValueError: if there are fewer vectors or input dimensions than
+        output dimensions
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if min(vectors.shape) < self.dim:
+            raise ValueError(f"Expected at least {self.dim} vectors and dimensions. Actual: {vectors.shape}")
+        self.mean = vectors.mean(axis=0)
+        _, singular_values, v_t = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        self.components = v_t[:self.dim].T
+        if self.whiten:
+            std = singular_values[:self.dim] / np.sqrt(len(vectors) - 1)
+            self.components = self.components / np.maximum(std, 1e-12)
+        self.components = self.components.astype(np.float32)
+        projected = self.project(vectors)
+        self.scales = (np.abs(projected).max(axis=0) / INT8_MAX).clip(min=1e-12).astype(np.float32)
+        return self
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Projects vectors onto the principal components and normalizes them.
+        :param vectors: an array of shape (num_vectors, hidden_size)
+        :return: an array of shape (num_vectors, dim)
+        """
+        projected = (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components
+        return projected / np.linalg.norm(projected, axis=1, keepdims=True).clip(min=1e-12)
+
+    def compress(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Projects and quantizes vectors for storage.
+        :param vectors: an array of shape (num_vectors, hidden_size)
+        :return: an int8 array of shape (num_vectors, dim)
+        """
+        codes = np.rint(self.project(vectors) / self.scales)
+        return np.clip(codes, -INT8_MAX, INT8_MAX).astype(np.int8)
+
+    def search(self, queries: np.ndarray, codes: np.ndarray, k: int = 5) -> np.ndarray:
+        """
+        Finds the compressed vectors most similar to each query.
+        :param queries: an array of shape (num_queries, hidden_size)
+        :param codes: the compressed vectors to search
+        :param k: the number of results per query
+        :return: the indices of the top k compressed vectors of each query
+        """
+        return search_int8(self.project(queries), codes, self.scales, k)
+
+    def save(self, path: str):
+        np.savez(path, dim=self.dim, whiten=self.whiten, mean=self.mean, components=self.components, scales=self.scales)
+
+    @staticmethod
+    def load(path: str) -> "EmbeddingCompressor":
+        with np.load(path) as data:
+            compressor = EmbeddingCompressor(int(data["dim"]), bool(data["whiten"]))
+            compressor.mean = data["mean"]
+            compressor.components = data["components"]
+            compressor.scales = data["scales"]
+        return compressor
+
+
+def score_int8(queries: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """
+    Scores projected float queries against int8 vectors. The per-dimension
+    scales are folded into the queries once, so the int8 vectors are never
+    dequantized in full. They are only widened one block at a time for the
+    matrix product, which keeps the memory traffic at one byte per value.
+    :param queries: an array of shape (num_queries, dim)
+    :param codes: an int8 array of shape (num_vectors, dim)
+    :param scales: the quantization scale of each dimension
+    :return: the (num_queries, num_vectors) scores
+    """
+    scaled_queries = (queries * scales).astype(np.float32).T
+    scores = np.empty(shape=(len(queries), len(codes)), dtype=np.float32)
+    for i in range(0, len(codes), SEARCH_BLOCK_SIZE):
+        block = codes[i:i + SEARCH_BLOCK_SIZE]
+        scores[:, i:i + len(block)] = (block.astype(np.float32) @ scaled_queries).T
+    return scores
+
+
+def search_int8(queries: np.ndarray, codes: np.ndarray, scales: np.ndarray, k: int = 5) -> np.ndarray:
+    """
+    Finds the int8 vectors most similar to each projected float query.
+    :param queries: an array of shape (num_queries, dim)
+    :param codes: an int8 array of shape (num_vectors, dim)
+    :param scales: the quantization scale of each dimension
+    :param k: the number of results per query
+    :return: the indices of the top k vectors of each query, most similar first
+    """
+    scores = score_int8(queries, codes, scales)
+    k = min(k, len(codes))
+    top_k = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top_k, axis=1), axis=1)
+    return np.take_along_axis(top_k, order, axis=1)
+
+
+def _get_fingerprint(index: VectorIndex) -> str:
+    """
+    Summarizes the shards and tombstones of an index, which change whenever
+    its live vectors do.
+    """
+    return json.dumps({"shards": [shard["id"] for shard in index.shards], "tombstones": index.tombstones},
+                      sort_keys=True)
+
+
+class CompressedIndex:
+    """
+    The int8 codes of a vector index's live vectors, stored in the index
+    directory next to the fp32 shards. The codes are a snapshot of the index,
+    so they must be rebuilt after the index changes.
+    """
+
+    def __init__(self, index_dir: str):
+        """
+        Loads the codes of an index.
+        :param index_dir: the index directory
+        :raise ValueError: if the codes of the index have not been built
+        """
+        codes_path = join(index_dir, CODES_NAME)
+        if not os.path.exists(codes_path):
+            raise ValueError(f"No compressed codes found in {index_dir}.")
+        self.index_dir = index_dir
+        self.compressor = EmbeddingCompressor.load(join(index_dir, COMPRESSOR_NAME))
+        with np.load(codes_path) as data:
+            self.song_ids = data["song_ids"]
+            self.codes = data["codes"]
+            self.fingerprint = str(data["fingerprint"])
+
+    @staticmethod
+    def build(index: VectorIndex, compressor: EmbeddingCompressor) -> "CompressedIndex":
+        """
+        Compresses the live vectors of an index and stores the codes and the
+        compressor in the index directory.
+        :param index: the vector index
+        :param compressor: a fitted compressor
+        :return: the compressed index
+        """
+        # taken before reading the vectors, so a concurrent write makes the
+        # codes look stale rather than current
+        fingerprint = _get_fingerprint(index)
+        song_ids, vectors = index.vectors()
+        compressor.save(join(index.index_dir, COMPRESSOR_NAME))
+        np.savez(join(index.index_dir, CODES_NAME), song_ids=song_ids, codes=compressor.compress(vectors),
+                 fingerprint=fingerprint)
+        return CompressedIndex(index.index_dir)
+
+    def is_current(self, index: VectorIndex) -> bool:
+        """
+        :return: true iff the index has not changed since the codes were built
+        """
+        return self.fingerprint == _get_fingerprint(index)
+
+    def search(self, queries: np.ndarray, k: int = 5) -> List[List[Tuple[str, float]]]:
+        """
+        Finds the most similar songs to each query vector using the int8
+        codes. The similarity of a song is the similarity of its closest
+        window.
+        :param queries: the (num_queries, hidden_size) query vectors
+        :param k: the number of songs to return per query
+        :return: the top k (song id, similarity) pairs of each query
+        """
+        projected = self.compressor.project(np.asarray(queries, dtype=np.float32).reshape(len(queries), -1))
+        return rank_songs(self.song_ids, score_int8(projected, self.codes, self.compressor.scales), k)
+
+
+def search_float(queries: np.ndarray, vectors: np.ndarray, k: int = 5) -> np.ndarray:
+    """
+    Finds the uncompressed vectors most similar to each query using cosine
+    similarity.
+    :param queries: an array of shape (num_queries, hidden_size)
+    :param vectors: an array of shape (num_vectors, hidden_size), with each
+    vector L2-normalized
+    :param k: the number of results per query
+    :return: the indices of the top k vectors of each query, most similar first
+    """
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True).clip(min=1e-12)
+    scores = queries @ vectors.T
+    k = min(k, len(vectors))
+    top_k = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top_k, axis=1), axis=1)
+    return np.take_along_axis(top_k, order, axis=1)
+
+
+def _time_search(search, num_queries: int, repeats: int = 3) -> Tuple[np.ndarray, float]:
+    """
+    Runs a search function several times.
+    :return: the search result, and the number of queries per second
+    """
+    top_k = search()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        search()
+    return top_k, num_queries * repeats / (time.perf_counter() - start)
+
+
+def compare(
+        compressor: EmbeddingCompressor, queries: np.ndarray, targets: np.ndarray, k: int = 5
+) -> Dict[str, float]:
+    """
+    Compares the memory footprint, search throughput and recall@k of
+    compressed and uncompressed target vectors.
+    :param compressor: a fitted compressor
+    :param queries: the query vector of each evaluation pair
+    :param targets: the target vector of each evaluation pair
+    :param k: the number of retrieved targets
+    :return: the measurements for both kinds of vectors
+    """
+    codes = compressor.compress(targets)
+    targets = targets / np.linalg.norm(targets, axis=1, keepdims=True).clip(min=1e-12)
+    float_top_k, float_qps = _time_search(lambda: search_float(queries, targets, k), len(queries))
+    int8_top_k, int8_qps = _time_search(lambda: compressor.search(queries, codes, k), len(queries))
+    return {
+        "float_bytes": targets.astype(np.float32).nbytes,
+        "int8_bytes": codes.nbytes + compressor.scales.nbytes,
+        "float_queries_per_second": float_qps,
+        "int8_queries_per_second": int8_qps,
+        "float_recall": compute_accuracy(float_top_k),
+        "int8_recall": compute_accuracy(int8_top_k)
+    }
+
+
+def main():
+    k = 5
+    artifact_name = "midibert-ckpt-10"
+    model = load_model(artifact_name)
+    train_queries, train_targets = encode_pairs(model, get_dataloaders("train", device), device)
+    train_vectors = torch.vstack([train_queries, train_targets]).cpu().numpy()
+    compressor = EmbeddingCompressor(COMPRESSED_DIM).fit(train_vectors)
+    queries, targets = encode_pairs(model, get_dataloaders("validation", device), device)
+    report = compare(compressor, queries.cpu().numpy(), targets.cpu().numpy(), k)
+    print(f"Memory: {report['float_bytes']} bytes (fp32) vs {report['int8_bytes']} bytes (int8)")
+    print(
+        f"Throughput: {report['float_queries_per_second']:.1f} queries/s (fp32) "
+        f"vs {report['int8_queries_per_second']:.1f} queries/s (int8)"
+    )
+    print(f"Top {k} accuracy: {report['float_recall']} (fp32) vs {report['int8_recall']} (int8)")
+    index = VectorIndex(join(root_dir, "artifact", "index", "train"))
+    if len(index) > 0:
+        compressed_index = CompressedIndex.build(index, compressor)
+        print(f"Stored {len(compressed_index.codes)} int8 vectors in {index.index_dir}")
+
+
+if __name__ == "__main__":
+    if torch.backends.mps.is_available():
+        device = torch.device("mps")
+    elif torch.cuda.is_available():
+        device = torch.device("cuda:0")
+    else:
+        device = torch.device("cpu")
+    main()
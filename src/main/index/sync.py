@@ -0,0 +1,124 @@
+import hashlib
+from os import walk
+from os.path import join, relpath
+from typing import Dict
+
+import numpy as np
+import torch
+from tqdm import tqdm
+
+from src.main.data import canonicalize_key, midi_to_windows
+from src.main.evaluation import load_model
+from src.main.index.vector_index import VectorIndex
+from src.main.model import MidiBert
+from src.main.util import root_dir
+
+BATCH_SIZE: int = 16
+# the number of shards after which a refresh triggers a compaction
+MAX_SHARDS: int = 32
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Computes the SHA-256 hash of a file's contents.
+    :param file_path: a file
+    :return: the hex digest of the file contents
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def encode_windows(model: MidiBert, windows: np.ndarray, batch_size: int = BATCH_SIZE, device="cpu") -> np.ndarray:
+    """
+    Encodes padded MidiBERT input windows into vectors.
+    :param model: the MidiBERT encoder
+    :param windows: an array of shape (num_windows, seq_len, 4)
+    :param batch_size: the number of windows encoded at once
+    :param device: the backend device
+    :return: an array of shape (num_windows, hidden_size)
+    """
+    vectors = [np.zeros(shape=(0, model.hidden_size), dtype=np.float32)]
+    with torch.no_grad():
+        for i in range(0, len(windows), batch_size):
+            batch = torch.tensor(windows[i:i + batch_size]).to(dtype=torch.int32, device=device)
+            vectors.append(model(batch).cpu().numpy())
+    return np.vstack(vectors)
+
+
+def sync_midi_dir(
+        index: VectorIndex, midi_dir: str, model: MidiBert, checkpoint: str, device="cpu", canonicalize: bool = False
+) -> Dict[str, int]:
+    """
+    Brings an index up to date with a directory of MIDI files. Only files
+    which are new, whose contents changed, or which were encoded by a
+    different checkpoint or canonicalization setting are re-encoded, and
+    files which no longer exist are removed from the index. The cost of a
+    refresh therefore scales with the number of changed files rather than the
+    size of the directory.
+    :param index: the vector index
+    :param midi_dir: a directory of MIDI files
+    :param model: the MidiBERT encoder
+    :param checkpoint: the name of the encoder checkpoint
+    :param device: the backend device
+    :param canonicalize: if true, transposes every window into its canonical
+    key before encoding. Queries must then be canonicalized too.
+    :return: the number of added, updated, removed and unchanged songs
+    """
+    hashes = {}
+    for root, _, files in walk(midi_dir):
+        for file in files:
+            abs_path = join(root, file)
+            hashes[relpath(abs_path, midi_dir)] = hash_file(abs_path)
+    stale = [
+        song_id for song_id, content_hash in hashes.items()
+        if song_id not in index
+        or index.files[song_id]["hash"] != content_hash
+        or index.files[song_id]["checkpoint"] != checkpoint
+        or index.files[song_id].get("canonical", False) != canonicalize
+    ]
+    removed = [song_id for song_id in index.files if song_id not in hashes]
+    num_updated = sum(song_id in index for song_id in stale)
+    model.to(device)
+    model.eval()
+    songs = {}
+    for song_id in tqdm(stale):
+        windows = midi_to_windows(join(midi_dir, song_id))
+        if canonicalize:
+            windows = np.array([canonicalize_key(window) for window in windows]).reshape(windows.shape)
+        songs[song_id] = encode_windows(model, windows, device=device)
+    if removed:
+        index.remove_many(removed)
+    if songs:
+        index.add_many(songs, checkpoint, {song_id: hashes[song_id] for song_id in songs}, canonicalize)
+    return {
+        "added": len(stale) - num_updated,
+        "updated": num_updated,
+        "removed": len(removed),
+        "unchanged": len(hashes) - len(stale)
+    }
+
+
+def main():
+    split = "train"
+    checkpoint = "midibert-ckpt-10"
+    midi_dir = join(root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", split, "midi")
+    index = VectorIndex(join(root_dir, "artifact", "index", split))
+    model = load_model(checkpoint)
+    summary = sync_midi_dir(index, midi_dir, model, checkpoint, device=device)
+    print(f"Index refreshed: {summary}")
+    if len(index.shards) > MAX_SHARDS:
+        print("Compacting index.")
+        index.compact()
+
+
+if __name__ == "__main__":
+    if torch.backends.mps.is_available():
+        device = torch.device("mps")
+    elif torch.cuda.is_available():
+        device = torch.device("cuda:0")
+    else:
+        device = torch.device("cpu")
+    main()
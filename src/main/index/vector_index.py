@@ -0,0 +1,297 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.main.util.io import HIDDEN_DIM
+
+MANIFEST_NAME: str = "manifest.json"
+MANIFEST_VERSION: int = 1
+
+
+def rank_songs(song_ids: np.ndarray, similarity: np.ndarray, k: int = 5) -> List[List[Tuple[str, float]]]:
+    """
+    Ranks songs by the similarity of their closest window.
+    :param song_ids: the song id of each vector
+    :param similarity: the (num_queries, num_vectors) similarity of each query
+    to each vector
+    :param k: the number of songs to return per query
+    :return: the top k (song id, similarity) pairs of each query
+    """
+    results = []
+    for row in similarity:
+        ranked = []
+        seen = set()
+        for idx in np.argsort(-row):
+            if song_ids[idx] not in seen:
+                seen.add(song_ids[idx])
+                ranked.append((str(song_ids[idx]), float(row[idx])))
+                if len(ranked) == k:
+                    break
+        results.append(ranked)
+    return results
+
+
+class VectorIndex:
+    """
+    A song vector index stored as a directory of immutable, append-only shards.
+
+    Every write creates a new shard file and every removal is recorded as a
+    tombstone, so updating a single song never rewrites existing vectors.
+    A tombstone for a song hides that song's vectors in every shard created
+    before the tombstone, which lets a removed song be added again later.
+    Compaction merges shards and physically drops tombstoned vectors. The
+    manifest records which checkpoint produced each shard, and the content
+    hash of each indexed file and whether its windows were canonicalized.
+    """
+
+    def __init__(self, index_dir: str, dim: int = HIDDEN_DIM):
+        self.index_dir = index_dir
+        self._lock = threading.RLock()
+        self._cache: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        os.makedirs(index_dir, exist_ok=True)
+        manifest_path = os.path.join(index_dir, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                self.manifest = json.load(f)
+            if self.manifest["dim"] != dim:
+                raise ValueError(f"Index dimension mismatch. Expected: {dim}, actual: {self.manifest['dim']}")
+        else:
+            self.manifest = {
+                "version": MANIFEST_VERSION,
+                "dim": dim,
+                "next_shard_id": 0,
+                "shards": [],
+                "tombstones": {},
+                "files": {}
+            }
+            self._write_manifest()
+
+    @property
+    def dim(self) -> int:
+        return self.manifest["dim"]
+
+    @property
+    def shards(self) -> List[dict]:
+        return self.manifest["shards"]
+
+    @property
+    def files(self) -> Dict[str, dict]:
+        return self.manifest["files"]
+
+    @property
+    def tombstones(self) -> Dict[str, int]:
+        return self.manifest["tombstones"]
+
+    def __contains__(self, song_id: str) -> bool:
+        return song_id in self.files
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def _write_manifest(self):
+        """
+        Atomically replaces the manifest on disk with the in-memory manifest.
+        """
+        manifest_path = os.path.join(self.index_dir, MANIFEST_NAME)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def _reserve_shard_id(self) -> int:
+        shard_id = self.manifest["next_shard_id"]
+        self.manifest["next_shard_id"] += 1
+        return shard_id
+
+    def _write_shard(self, shard_id: int, song_ids: np.ndarray, vectors: np.ndarray, checkpoint: str) -> dict:
+        """
+        Writes a shard file to disk and returns its manifest entry.
+        """
+        shard_name = f"shard-{shard_id:06d}.npz"
+        np.savez(os.path.join(self.index_dir, shard_name), song_ids=song_ids, vectors=vectors)
+        return {
+            "id": shard_id,
+            "name": shard_name,
+            "checkpoint": checkpoint,
+            "num_vectors": len(vectors),
+            "created": time.time()
+        }
+
+    def _read_shard(self, shard: dict) -> Tuple[np.ndarray, np.ndarray]:
+        with np.load(os.path.join(self.index_dir, shard["name"])) as data:
+            return data["song_ids"], data["vectors"]
+
+    def _is_live(self, song_ids: np.ndarray, shard_id: int) -> np.ndarray:
+        """
+        Computes which rows of a shard are not hidden by a tombstone.
+        """
+        tombstones = self.tombstones
+        return np.array([shard_id >= tombstones.get(song_id, -1) for song_id in song_ids], dtype=bool)
+
+    def add_many(
+            self, songs: Dict[str, np.ndarray], checkpoint: str, hashes: Optional[Dict[str, str]] = None,
+            canonical: bool = False
+    ):
+        """
+        Adds the vectors of multiple songs to the index as a single new shard.
+        Songs which are already indexed are replaced.
+        :param songs: a mapping from each song id to its (num_windows, dim)
+        vectors. A song may have no vectors, in which case only its hash is
+        recorded.
+        :param checkpoint: the name of the checkpoint that produced the vectors
+        :param hashes: the content hash of each song's source file
+        :param canonical: whether the windows were transposed into their
+        canonical key before encoding
+        """
+        hashes = hashes or {}
+        song_ids = []
+        vectors = []
+        for song_id, song_vectors in songs.items():
+            song_vectors = np.asarray(song_vectors, dtype=np.float32).reshape(-1, self.dim)
+            song_ids += [song_id] * len(song_vectors)
+            vectors.append(song_vectors)
+        vectors = np.vstack(vectors) if vectors else np.zeros(shape=(0, self.dim), dtype=np.float32)
+        with self._lock:
+            for song_id in songs:
+                if song_id in self.files:
+                    self.tombstones[song_id] = self.manifest["next_shard_id"]
+            shard_id = self._reserve_shard_id()
+            if len(vectors) > 0:
+                self.shards.append(self._write_shard(shard_id, np.array(song_ids), vectors, checkpoint))
+            for song_id in songs:
+                self.files[song_id] = {"hash": hashes.get(song_id), "checkpoint": checkpoint, "canonical": canonical}
+            self._write_manifest()
+            self._cache = None
+
+    def add(self, song_id: str, vectors: np.ndarray, checkpoint: str, content_hash: Optional[str] = None):
+        """
+        Adds the vectors of a single song to the index.
+        :param song_id: the song id
+        :param vectors: the (num_windows, dim) vectors of the song
+        :param checkpoint: the name of the checkpoint that produced the vectors
+        :param content_hash: the content hash of the song's source file
+        """
+        self.add_many({song_id: vectors}, checkpoint, {song_id: content_hash})
+
+    def update(self, song_id: str, vectors: np.ndarray, checkpoint: str, content_hash: Optional[str] = None):
+        """
+        Replaces the vectors of an indexed song.
+        :raise KeyError: if the song is not in the index
+        """
+        if song_id not in self:
+            raise KeyError(f"Song {song_id} is not in the index.")
+        self.add(song_id, vectors, checkpoint, content_hash)
+
+    def remove_many(self, song_ids: List[str]):
+        """
+        Removes multiple songs from the index by recording tombstones.
+        :raise KeyError: if any song is not in the index
+        """
+        with self._lock:
+            for song_id in song_ids:
+                if song_id not in self:
+                    raise KeyError(f"Song {song_id} is not in the index.")
+            for song_id in song_ids:
+                self.tombstones[song_id] = self.manifest["next_shard_id"]
+                del self.files[song_id]
+            self._write_manifest()
+            self._cache = None
+
+    def remove(self, song_id: str):
+        """
+        Removes a song from the index by recording a tombstone.
+        :raise KeyError: if the song is not in the index
+        """
+        self.remove_many([song_id])
+
+    def vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Loads every live vector in the index.
+        :return: the song id of each vector, and the (num_vectors, dim) vectors
+        """
+        with self._lock:
+            if self._cache is None:
+                all_song_ids = [np.array([], dtype=str)]
+                all_vectors = [np.zeros(shape=(0, self.dim), dtype=np.float32)]
+                for shard in self.shards:
+                    song_ids, vectors = self._read_shard(shard)
+                    live = self._is_live(song_ids, shard["id"])
+                    all_song_ids.append(song_ids[live])
+                    all_vectors.append(vectors[live])
+                self._cache = (np.concatenate(all_song_ids), np.vstack(all_vectors))
+            return self._cache
+
+    def search(self, queries: np.ndarray, k: int = 5) -> List[List[Tuple[str, float]]]:
+        """
+        Finds the most similar songs to each query vector using cosine
+        similarity. The similarity of a song is the similarity of its closest
+        window.
+        :param queries: the (num_queries, dim) query vectors
+        :param k: the number of songs to return per query
+        :return: the top k (song id, similarity) pairs of each query
+        """
+        song_ids, vectors = self.vectors()
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) == 0:
+            return [[] for _ in queries]
+        queries_norm = queries / np.linalg.norm(queries, axis=1, keepdims=True).clip(min=1e-12)
+        vectors_norm = vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+        return rank_songs(song_ids, queries_norm @ vectors_norm.T, k)
+
+    def compact(self, background: bool = False) -> Optional[threading.Thread]:
+        """
+        Merges all current shards produced by the same checkpoint into a
+        single shard, dropping tombstoned vectors. Writes made while the
+        compaction runs are kept, since they go into newer shards.
+        :param background: if true, runs the compaction in a background thread
+        :return: the compaction thread if running in the background
+        """
+        if background:
+            thread = threading.Thread(target=self._compact, daemon=True)
+            thread.start()
+            return thread
+        self._compact()
+        return None
+
+    def _compact(self):
+        with self._lock:
+            snapshot = list(self.shards)
+            checkpoints = sorted({shard["checkpoint"] for shard in snapshot})
+            reserved_ids = {checkpoint: self._reserve_shard_id() for checkpoint in checkpoints}
+            self._write_manifest()
+        # the slow part runs without the lock. Tombstones recorded from here on
+        # are bounded by a larger id than the reserved ids, so they also hide
+        # vectors in the merged shards.
+        merged_shards = []
+        for checkpoint in checkpoints:
+            all_song_ids = []
+            all_vectors = []
+            for shard in snapshot:
+                if shard["checkpoint"] != checkpoint:
+                    continue
+                song_ids, vectors = self._read_shard(shard)
+                with self._lock:
+                    live = self._is_live(song_ids, shard["id"])
+                all_song_ids.append(song_ids[live])
+                all_vectors.append(vectors[live])
+            song_ids = np.concatenate(all_song_ids)
+            if len(song_ids) > 0:
+                merged_shards.append(
+                    self._write_shard(reserved_ids[checkpoint], song_ids, np.vstack(all_vectors), checkpoint)
+                )
+        with self._lock:
+            snapshot_ids = {shard["id"] for shard in snapshot}
+            newer_shards = [shard for shard in self.shards if shard["id"] not in snapshot_ids]
+            self.manifest["shards"] = sorted(merged_shards + newer_shards, key=lambda shard: shard["id"])
+            min_reserved_id = min(reserved_ids.values(), default=0)
+            self.manifest["tombstones"] = {
+                song_id: bound for song_id, bound in self.tombstones.items() if bound > min_reserved_id
+            }
+            self._write_manifest()
+            self._cache = None
+        for shard in snapshot:
+            os.remove(os.path.join(self.index_dir, shard["name"]))
@@ -1 +1 @@
-from src.main.model.midibert import Embeddings, MidiBert
+from src.main.model.midibert import Embeddings, MidiBert, MidiBertStudent
@@ -77,3 +77,20 @@ class MidiBert(nn.Module):
             random.choice(range(c3)),
             random.choice(range(c4))
         ])
+
+
+class MidiBertStudent(MidiBert):
+    """
+    A smaller MidiBert encoder trained to reproduce the pooled outputs of a
+    full-size teacher. The pooled output is projected to the teacher's hidden
+    size, so student vectors can be compared against teacher vectors.
+    """
+    def __init__(self, bertConfig, e2w, w2e, output_size=768):
+        super(MidiBertStudent, self).__init__(bertConfig, e2w, w2e)
+        self.out_linear = nn.Linear(bertConfig.hidden_size, output_size)
+        # size of the output vectors, rather than the narrower internal size
+        self.hidden_size = output_size
+
+    def forward(self, input_ids, attn_mask=None, output_hidden_states=True):
+        y = super(MidiBertStudent, self).forward(input_ids, attn_mask, output_hidden_states)
+        return self.out_linear(y)
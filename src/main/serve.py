@@ -0,0 +1,233 @@
+import os
+import queue
+import time
+from contextlib import suppress
+from functools import partial
+from os.path import join
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from src.main.data import canonicalize_key, midi_to_windows
+from src.main.evaluation import load_model
+from src.main.index import encode_windows
+from src.main.model import MidiBert
+from src.main.util import root_dir
+
+BATCH_SIZE: int = 16
+NUM_BENCHMARK_FILES: int = 200
+# the number of seconds between checks that the encoding workers are alive
+RESULT_POLL_INTERVAL: float = 1.0
+
+
+def _parse_midi(file_path: str, canonicalize: bool = False) -> np.ndarray:
+    """
+    Converts a MIDI file into encoder input windows in a parsing process.
+    """
+    windows = midi_to_windows(file_path).astype(np.int32)
+    if canonicalize:
+        windows = np.array([canonicalize_key(window) for window in windows]).reshape(windows.shape)
+    return windows
+
+
+def _encode_worker(model: MidiBert, tasks: mp.Queue, results: mp.Queue, intra_op_threads: int, batch_size: int):
+    """
+    Encodes windows from the task queue until it receives None. The model
+    parameters live in shared memory, so every worker reads the same copy.
+    A task which fails returns its exception instead of its vectors.
+    """
+    torch.set_num_threads(intra_op_threads)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, windows = task
+        try:
+            result = encode_windows(model, windows, batch_size)
+        except Exception as e:
+            result = e
+        results.put((task_id, result))
+
+
+class InferenceServer:
+    """
+    Serves a MidiBert encoder from several worker processes which share a
+    single copy of the model weights. MIDI parsing runs in a separate pool of
+    processes, so parsing the next files overlaps with encoding.
+    """
+
+    def __init__(
+            self, model: MidiBert, num_workers: int = 2, num_parse_workers: int = 2, intra_op_threads: int = 1,
+            batch_size: int = BATCH_SIZE, canonicalize: bool = False, start_method: Optional[str] = None
+    ):
+        """
+        :param model: the encoder. Its parameters are moved to shared memory.
+        :param num_workers: the number of encoding processes
+        :param num_parse_workers: the number of MIDI parsing processes
+        :param intra_op_threads: the number of PyTorch threads per encoding
+        process
+        :param batch_size: the number of windows encoded at once
+        :param canonicalize: if true, transposes every window into its
+        canonical key before encoding
+        :param start_method: the multiprocessing start method. Defaults to
+        fork where available, so workers inherit the loaded model.
+        """
+        self.model = model
+        self.num_workers = num_workers
+        self.num_parse_workers = num_parse_workers
+        self.intra_op_threads = intra_op_threads
+        self.batch_size = batch_size
+        self.canonicalize = canonicalize
+        if start_method is None:
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        self.context = mp.get_context(start_method)
+        self.workers = []
+        self.parse_pool = None
+        self.tasks = None
+        self.results = None
+        self.next_task_id = 0
+
+    def start(self) -> "InferenceServer":
+        self.model.eval()
+        self.model.share_memory()
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.workers = [
+            self.context.Process(
+                target=_encode_worker,
+                args=(self.model, self.tasks, self.results, self.intra_op_threads, self.batch_size),
+                daemon=True
+            )
+            for _ in range(self.num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+        self.parse_pool = self.context.Pool(self.num_parse_workers)
+        return self
+
+    def stop(self):
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        if self.parse_pool is not None:
+            self.parse_pool.close()
+            self.parse_pool.join()
+            self.parse_pool = None
+
+    def __enter__(self) -> "InferenceServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def encode_windows(self, windows: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Encodes already parsed input windows.
+        :param windows: the (num_windows, seq_len, 4) windows of each request
+        :return: the (num_windows, hidden_size) vectors of each request
+        """
+        first_task_id = self.next_task_id
+        for request_windows in windows:
+            self.tasks.put((self.next_task_id, request_windows))
+            self.next_task_id += 1
+        return self._collect(first_task_id, len(windows))
+
+    def encode_files(self, file_paths: List[str]) -> List[np.ndarray]:
+        """
+        Parses and encodes MIDI files. Each file is handed to the encoding
+        workers as soon as it is parsed.
+        :param file_paths: the MIDI files
+        :return: the (num_windows, hidden_size) vectors of each file
+        """
+        first_task_id = self.next_task_id
+        parse = partial(_parse_midi, canonicalize=self.canonicalize)
+        try:
+            for windows in self.parse_pool.imap(parse, file_paths):
+                self.tasks.put((self.next_task_id, windows))
+                self.next_task_id += 1
+        except Exception:
+            # wait for the files already handed to the workers, so their
+            # results are not left in the queue for the next call
+            with suppress(Exception):
+                self._collect(first_task_id, self.next_task_id - first_task_id)
+            raise
+        return self._collect(first_task_id, len(file_paths))
+
+    def _collect(self, first_task_id: int, num_tasks: int) -> List[np.ndarray]:
+        """
+        Waits for the results of consecutive tasks. Results of other tasks,
+        e.g. of an earlier call that failed, are discarded.
+        :param first_task_id: the id of the first task
+        :param num_tasks: the number of tasks
+        :return: the vectors of each task
+        :raise RuntimeError: if an encoding worker exits
+        """
+        vectors = {}
+        while len(vectors) < num_tasks:
+            try:
+                task_id, result = self.results.get(timeout=RESULT_POLL_INTERVAL)
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in self.workers):
+                    raise RuntimeError("An encoding worker exited unexpectedly.")
+                continue
+            if first_task_id <= task_id < first_task_id + num_tasks:
+                vectors[task_id] = result
+        # only raise once every result of this call is collected
+        for result in vectors.values():
+            if isinstance(result, Exception):
+                raise result
+        return [vectors[first_task_id + i] for i in range(num_tasks)]
+
+    def pids(self) -> List[int]:
+        pids = [os.getpid()] + [worker.pid for worker in self.workers]
+        if self.parse_pool is not None:
+            pids += [process.pid for process in self.parse_pool._pool]
+        return pids
+
+
+def get_memory_usage(pids: List[int]) -> Dict[str, int]:
+    """
+    Measures the memory used by a group of processes. The proportional set
+    size (PSS) splits shared pages between the processes sharing them, so
+    unlike the resident set size (RSS) it does not count shared model weights
+    once per worker. Only supported on Linux.
+    :param pids: the process ids
+    :return: the total RSS and PSS in bytes
+    """
+    usage = {"rss": 0, "pss": 0}
+    for pid in pids:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                if key.lower() in usage:
+                    usage[key.lower()] += int(value.split()[0]) * 1024
+    return usage
+
+
+def main():
+    artifact_name = "midibert-ckpt-10"
+    model = load_model(artifact_name)
+    midi_dir = join(root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", "validation", "midi")
+    file_paths = [join(midi_dir, file) for file in sorted(os.listdir(midi_dir))[:NUM_BENCHMARK_FILES]]
+    num_cores = os.cpu_count() or 1
+    for num_workers in [1, 2, 4]:
+        intra_op_threads = max(1, num_cores // num_workers)
+        with InferenceServer(model, num_workers=num_workers, intra_op_threads=intra_op_threads) as server:
+            start = time.perf_counter()
+            vectors = server.encode_files(file_paths)
+            elapsed = time.perf_counter() - start
+            usage = get_memory_usage(server.pids())
+        num_windows = sum(len(file_vectors) for file_vectors in vectors)
+        print(
+            f"{num_workers} workers x {intra_op_threads} threads: {len(file_paths) / elapsed:.1f} files/s, "
+            f"{num_windows / elapsed:.1f} windows/s, rss={usage['rss'] / 2 ** 20:.0f}MB, "
+            f"pss={usage['pss'] / 2 ** 20:.0f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,37 +2,33 @@ from typing import Tuple
 
 import torch
 from torch.optim import Adam, Optimizer
-from torch.utils.data import DataLoader, TensorDataset
 from tqdm import tqdm
 
 from src.main.model import MidiBert
-from src.main.util import load_midibert, load_mono_midi_trans_dataset, pairwise_loss, save_midibert
+from src.main.util import PrefetchLoader, load_midibert, load_mono_midi_trans_dataset, pairwise_loss, save_midibert
 
 NUM_EPOCHS: int = 4
 BATCH_SIZE: int = 16
 
 
-def get_dataloaders() -> Tuple[DataLoader, DataLoader]:
+def get_dataloaders(device="cpu") -> Tuple[PrefetchLoader, PrefetchLoader]:
     train_tensors = load_mono_midi_trans_dataset("train")
     train_tensors = train_tensors.view(-1, 2, *train_tensors.size()[1:])
     val_tensors = load_mono_midi_trans_dataset("validation")
     val_tensors = val_tensors.view(-1, 2, *val_tensors.size()[1:])
-    train_loader = DataLoader(TensorDataset(train_tensors), batch_size=BATCH_SIZE, shuffle=True)
-    val_loader = DataLoader(TensorDataset(val_tensors), batch_size=BATCH_SIZE, shuffle=True)
+    train_loader = PrefetchLoader(train_tensors, batch_size=BATCH_SIZE, shuffle=True, device=device)
+    val_loader = PrefetchLoader(val_tensors, batch_size=BATCH_SIZE, shuffle=True, device=device)
     return train_loader, val_loader
 
 
-def train(model: MidiBert, train_loader: DataLoader, val_loader: DataLoader, optimizer: Optimizer):
+def train(model: MidiBert, train_loader: PrefetchLoader, val_loader: PrefetchLoader, optimizer: Optimizer):
     model.to(device)
     train_history = []
     val_history = []
     for _ in range(NUM_EPOCHS):
         model.train()
         train_loss = 0
-        for batch in tqdm(train_loader):
-            original = batch[0][:, 0, :, :].to(device)
-            transpose = batch[0][:, 1, :, :].to(device)
-
+        for original, transpose in tqdm(train_loader):
             optimizer.zero_grad()
 
             original_vec = model(original)
@@ -49,9 +45,7 @@ def train(model: MidiBert, train_loader: DataLoader, val_loader: DataLoader, opt
         model.eval()
         val_loss = 0
         with torch.no_grad():
-            for batch in tqdm(val_loader):
-                original = batch[0][:, 0, :, :].to(device)
-                transpose = batch[0][:, 1, :, :].to(device)
+            for original, transpose in tqdm(val_loader):
                 original_vec = model(original)
                 transpose_vec = model(transpose)
                 loss = pairwise_loss(original_vec, transpose_vec, device=device)
@@ -59,13 +53,17 @@ def train(model: MidiBert, train_loader: DataLoader, val_loader: DataLoader, opt
         val_history.append(val_loss / len(val_loader))
 
         print(f"Epoch {len(train_history)}, train-loss={train_history[-1]}, val-loss={val_history[-1]}")
+        print(
+            f"Mean data wait per step: train={1000 * train_loader.mean_wait_time():.2f}ms, "
+            f"val={1000 * val_loader.mean_wait_time():.2f}ms"
+        )
         save_midibert(model, f"midibert-epoch-{len(train_history)}")
     return train_history, val_history
 
 
 def main():
     model = load_midibert()
-    train_loader, val_loader = get_dataloaders()
+    train_loader, val_loader = get_dataloaders(device)
     optimizer = Adam(model.parameters(), lr=1e-3, betas=(0.9, 0.999))
     train(model, train_loader, val_loader, optimizer)
 
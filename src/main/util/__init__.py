@@ -1,2 +1,6 @@
-from src.main.util.io import get_parent_dir, load_midibert, load_mono_midi_trans_dataset, root_dir, save_midibert
-from src.main.util.loss import pairwise_loss
+from src.main.util.io import (
+    get_parent_dir, init_midibert_student, load_midibert, load_midibert_student, load_mono_midi_trans_dataset, root_dir,
+    save_midibert
+)
+from src.main.util.loss import distillation_loss, pairwise_loss
+from src.main.util.prefetch import PrefetchLoader
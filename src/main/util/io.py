@@ -4,10 +4,14 @@ import pickle
 import torch
 from transformers import BertConfig
 
-from src.main.model import MidiBert
+from src.main.model import MidiBert, MidiBertStudent
 
 MAX_SEQ_LEN: int = 512
 HIDDEN_DIM: int = 768
+# shape of the distilled student encoder
+STUDENT_NUM_LAYERS: int = 4
+STUDENT_HIDDEN_DIM: int = 384
+STUDENT_NUM_HEADS: int = 6
 
 
 def get_parent_dir(path: str, level: int = 1) -> str:
@@ -61,6 +65,48 @@ def load_midibert(artifact_name: str = "pretrain_model.ckpt") -> MidiBert:
     return model
 
 
+def init_midibert_student(
+        num_layers: int = STUDENT_NUM_LAYERS, hidden_dim: int = STUDENT_HIDDEN_DIM, num_heads: int = STUDENT_NUM_HEADS
+) -> MidiBertStudent:
+    """
+    Initializes an untrained student MidiBERT encoder, whose output vectors
+    have the same size as the full MidiBERT encoder.
+    :param num_layers: the number of transformer layers
+    :param hidden_dim: the hidden size of each transformer layer
+    :param num_heads: the number of attention heads in each layer
+    :return: the student MidiBERT encoder
+    """
+    configuration = BertConfig(
+        max_position_embeddings=MAX_SEQ_LEN,
+        position_embedding_type="relative_key_query",
+        hidden_size=hidden_dim,
+        num_hidden_layers=num_layers,
+        num_attention_heads=num_heads,
+        intermediate_size=4 * hidden_dim
+    )
+    with open(dict_path, "rb") as f:
+        e2w, w2e = pickle.load(f)
+    return MidiBertStudent(bertConfig=configuration, e2w=e2w, w2e=w2e, output_size=HIDDEN_DIM)
+
+
+def load_midibert_student(artifact_name: str, **kwargs) -> MidiBertStudent:
+    """
+    Loads a distilled student MidiBERT checkpoint from the artifact directory.
+    :param artifact_name: the name of the student artifact file in the
+    "BeMuse/artifact/midibert/" directory
+    :param kwargs: the student shape used by init_midibert_student
+    :return: the student MidiBERT encoder
+    :raise ValueError: if the checkpoint does not exist in the artifact
+    directory
+    """
+    midibert_artifact_path = os.path.join(root_dir, "artifact", "midibert", artifact_name)
+    if not os.path.exists(midibert_artifact_path):
+        raise ValueError("Unable to find artifact file " + midibert_artifact_path)
+    model = init_midibert_student(**kwargs)
+    model.load_state_dict(state_dict=torch.load(midibert_artifact_path, map_location="cpu"))
+    return model
+
+
 def save_midibert(model: MidiBert, artifact_name: str):
     """
     Saves a MidiBERT model state into a given artifact file.
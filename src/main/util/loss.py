@@ -17,3 +17,14 @@ def pairwise_loss(estimate: torch.Tensor, target: torch.Tensor, device) -> torch
     actual_similarity = torch.matmul(estimate_norm, target_norm.T)
     expected_similarity = torch.eye(num_samples).to(device)
     return (1 / num_samples) * torch.sum((actual_similarity - expected_similarity) ** 2)
+
+
+def distillation_loss(student: torch.Tensor, teacher: torch.Tensor) -> torch.Tensor:
+    """
+    Computes the loss between student and teacher vectors as the mean cosine
+    distance between each pair.
+    :param student: the student vectors
+    :param teacher: the teacher vectors for the same inputs
+    :return: the mean cosine distance between the student and teacher vectors
+    """
+    return torch.mean(1 - F.cosine_similarity(student, teacher, dim=1))
@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+from typing import Iterator, List, Tuple
+
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+NUM_WORKERS: int = 2
+# the number of batches prepared ahead of the training or evaluation step
+NUM_PREFETCH_BATCHES: int = 2
+
+
+def _collate_pairs(batch: List[Tuple[torch.Tensor]]) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Stacks a batch of (original, transposed) pairs and splits it into an
+    original batch and a transposed batch of token ids. Runs in the loader
+    workers, off the main thread.
+    """
+    pairs = torch.stack([item[0] for item in batch]).to(dtype=torch.long)
+    return pairs[:, 0].contiguous(), pairs[:, 1].contiguous()
+
+
+class PrefetchLoader:
+    """
+    Loads batches of (original, transposed) sequence pairs from a tensor of
+    shape (num_pairs, 2, seq_len, 4). Batches are collated by worker
+    processes and copied to the device by a background thread, so input
+    preparation overlaps with the model's computation. On CUDA, batches are
+    collated into pinned memory and copied on a separate stream without
+    blocking. The time each step spends waiting for its batch is recorded.
+    """
+
+    def __init__(
+            self, pairs: torch.Tensor, batch_size: int, shuffle: bool = False, device="cpu",
+            num_workers: int = NUM_WORKERS, num_prefetch_batches: int = NUM_PREFETCH_BATCHES
+    ):
+        self.device = torch.device(device)
+        self.num_prefetch_batches = num_prefetch_batches
+        self.loader = DataLoader(
+            TensorDataset(pairs),
+            batch_size=batch_size,
+            shuffle=shuffle,
+            num_workers=num_workers,
+            collate_fn=_collate_pairs,
+            pin_memory=self.device.type == "cuda",
+            prefetch_factor=num_prefetch_batches if num_workers > 0 else None,
+            persistent_workers=num_workers > 0
+        )
+        self.wait_times: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.loader)
+
+    def _copy_to_device(self, batch: Tuple[torch.Tensor, torch.Tensor], stream):
+        if stream is None:
+            return tuple(tensor.to(self.device, non_blocking=True) for tensor in batch), None
+        with torch.cuda.stream(stream):
+            batch = tuple(tensor.to(self.device, non_blocking=True) for tensor in batch)
+            event = torch.cuda.Event()
+            event.record(stream)
+        return batch, event
+
+    @staticmethod
+    def _put(batches: queue.Queue, stop: threading.Event, item) -> bool:
+        """
+        Adds an item to the queue, unless the consumer stops first.
+        :return: true iff the item was added
+        """
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self, batches: queue.Queue, stop: threading.Event):
+        stream = torch.cuda.Stream(self.device) if self.device.type == "cuda" else None
+        try:
+            for batch in self.loader:
+                if not self._put(batches, stop, self._copy_to_device(batch, stream)):
+                    return
+            self._put(batches, stop, None)
+        except Exception as e:
+            self._put(batches, stop, e)
+
+    def __iter__(self) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+        batches = queue.Queue(maxsize=self.num_prefetch_batches)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(batches, stop), daemon=True)
+        producer.start()
+        self.wait_times = []
+        try:
+            while True:
+                start = time.perf_counter()
+                item = batches.get()
+                if isinstance(item, Exception):
+                    raise item
+                if item is None:
+                    break
+                batch, event = item
+                if event is not None:
+                    current_stream = torch.cuda.current_stream(self.device)
+                    current_stream.wait_event(event)
+                    for tensor in batch:
+                        tensor.record_stream(current_stream)
+                self.wait_times.append(time.perf_counter() - start)
+                yield batch
+        finally:
+            stop.set()
+            producer.join()
+
+    def mean_wait_time(self) -> float:
+        """
+        :return: the mean time in seconds each step of the last pass waited
+        for its batch
+        """
+        return sum(self.wait_times) / max(len(self.wait_times), 1)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from src.main.data import pad
+from src.main.data.canonical import canonicalize_key, estimate_tonic, transpose
+
+# the opening of "Twinkle, Twinkle, Little Star" in C major
+sequence = np.array([
+    (1, 0, 38, 8), (0, 4, 38, 8), (0, 8, 45, 8), (0, 12, 45, 8), (1, 0, 47, 8), (0, 4, 47, 8), (0, 8, 45, 16),
+    (1, 0, 43, 8), (0, 4, 43, 8), (0, 8, 42, 8), (0, 12, 42, 8), (1, 0, 40, 8), (0, 4, 40, 8), (0, 8, 38, 16)
+])
+
+
+def test_estimate_tonic():
+    assert estimate_tonic(sequence) == 0
+    assert estimate_tonic(transpose(sequence, 7)) == 7
+
+
+def test_canonicalize_key_transposition_invariant():
+    canonical_sequence = canonicalize_key(sequence)
+    for shift in range(-12, 13):
+        assert np.array_equal(canonical_sequence, canonicalize_key(transpose(sequence, shift)))
+
+
+def test_canonicalize_key_padding():
+    padded_sequences = pad([sequence, sequence[:5]])
+    canonical_sequence = canonicalize_key(padded_sequences[1])
+    assert np.array_equal(canonical_sequence[5:], padded_sequences[1][5:])
+
+
+def test_transpose_folds_octaves():
+    transposed_sequence = transpose(sequence, 45)
+    assert all(transposed_sequence[:, 2] <= 85)
+    assert all((transposed_sequence[:, 2] - sequence[:, 2]) % 12 == 45 % 12)
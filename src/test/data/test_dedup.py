@@ -0,0 +1,36 @@
+import numpy as np
+
+from src.main.data.dedup import deduplicate, get_shingles
+
+np.random.seed(24)
+
+
+def _random_sequence(length: int = 100) -> np.ndarray:
+    return np.stack([
+        np.random.randint(0, 2, length), np.random.randint(0, 16, length),
+        np.random.randint(20, 60, length), np.random.randint(1, 32, length)
+    ], axis=1)
+
+
+def test_get_shingles_transposition_invariant():
+    sequence = _random_sequence()
+    transposed_sequence = sequence.copy()
+    transposed_sequence[:, 2] += 5
+    assert get_shingles(sequence) == get_shingles(transposed_sequence)
+
+
+def test_deduplicate_exact():
+    first, second = _random_sequence(), _random_sequence()
+    kept, report = deduplicate([first, second, first.copy()])
+    assert len(kept) == 2
+    assert np.array_equal(kept[0], first) and np.array_equal(kept[1], second)
+    assert report == {"num_sequences": 3, "exact_duplicates": 1, "near_duplicates": 0}
+
+
+def test_deduplicate_near():
+    first, second = _random_sequence(), _random_sequence()
+    near_first = first.copy()
+    near_first[-1, 3] += 1
+    kept, report = deduplicate([first, second, near_first])
+    assert len(kept) == 2
+    assert report["near_duplicates"] == 1
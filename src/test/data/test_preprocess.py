@@ -1,6 +1,8 @@
 import os
 
-from src.main.data.preprocess import get_bar_of_tick, get_position_of_tick, midi_to_tuple
+import mido
+
+from src.main.data.preprocess import get_bar_of_tick, get_position_of_tick, midi_to_tuple, midi_to_tuple_fast
 from src.main.util.io import root_dir
 
 
@@ -27,3 +29,44 @@ def test_midi_to_tuple():
     sequence = midi_to_tuple(example_path)
     for i in range(5):
         assert sequence[i][0] == 1
+
+
+def test_midi_to_tuple_fast_matches_midi_to_tuple():
+    path = os.path.join(root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", "train", "midi")
+    for file in ["435.mid", "524.mid", "100017.mid", "100025.mid", "882086.mid"]:
+        assert midi_to_tuple_fast(os.path.join(path, file)) == midi_to_tuple(os.path.join(path, file))
+
+
+def test_midi_to_tuple_fast_invalid_sequence():
+    # contains a note which is too long for MidiBERT
+    example_path = os.path.join(
+        root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", "train", "midi", "100005.mid"
+    )
+    assert len(midi_to_tuple(example_path)) > 0
+    assert midi_to_tuple_fast(example_path) == []
+
+
+def test_midi_to_tuple_fast_missing_track():
+    example_path = os.path.join(
+        root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", "train", "midi", "435.mid"
+    )
+    assert midi_to_tuple_fast(example_path, track=100) == []
+
+
+def test_midi_to_tuple_fast_time_signature_change(tmp_path):
+    # one bar of 3/4 followed by one bar of 4/4, with a quarter note on each beat
+    track = mido.MidiTrack()
+    track.append(mido.MetaMessage("time_signature", numerator=3, denominator=4, time=0))
+    for i in range(7):
+        if i == 3:
+            track.append(mido.MetaMessage("time_signature", numerator=4, denominator=4, time=0))
+        track.append(mido.Message("note_on", note=60, velocity=100, time=0))
+        track.append(mido.Message("note_off", note=60, velocity=0, time=480))
+    midi_file = mido.MidiFile(ticks_per_beat=480)
+    midi_file.tracks.append(track)
+    file_path = str(tmp_path / "example.mid")
+    midi_file.save(file_path)
+    sequence = midi_to_tuple_fast(file_path)
+    assert [word[0] for word in sequence] == [1, 0, 0, 1, 0, 0, 0]
+    assert [word[1] for word in sequence] == [0, 5, 10, 0, 4, 8, 12]
+    assert all(word[2:] == (60 - 22, 16) for word in sequence)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from src.main.index.compress import CompressedIndex, EmbeddingCompressor, search_float
+from src.main.index.vector_index import VectorIndex
+
+np.random.seed(24)
+
+
+def _make_vectors(num_vectors: int = 200, hidden_size: int = 32, rank: int = 8) -> np.ndarray:
+    basis = np.random.randn(rank, hidden_size)
+    return (np.random.randn(num_vectors, rank) @ basis + 0.01 * np.random.randn(num_vectors, hidden_size)).astype(
+        np.float32
+    )
+
+
+def test_compress_shape():
+    vectors = _make_vectors()
+    compressor = EmbeddingCompressor(dim=8).fit(vectors)
+    codes = compressor.compress(vectors)
+    assert codes.shape == (200, 8)
+    assert codes.dtype == np.int8
+
+
+def test_search_matches_uncompressed():
+    vectors = _make_vectors()
+    compressor = EmbeddingCompressor(dim=8).fit(vectors)
+    codes = compressor.compress(vectors)
+    queries = vectors[:20] + 0.01 * np.random.randn(20, 32).astype(np.float32)
+    vectors_norm = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert np.array_equal(compressor.search(queries, codes, k=1), search_float(queries, vectors_norm, k=1))
+
+
+def test_save_and_load(tmp_path):
+    vectors = _make_vectors()
+    compressor = EmbeddingCompressor(dim=8, whiten=True).fit(vectors)
+    path = str(tmp_path / "compressor.npz")
+    compressor.save(path)
+    loaded = EmbeddingCompressor.load(path)
+    assert loaded.whiten
+    assert np.array_equal(compressor.compress(vectors), loaded.compress(vectors))
+
+
+def test_fit_too_few_vectors():
+    try:
+        EmbeddingCompressor(dim=64).fit(_make_vectors(num_vectors=10))
+        assert False
+    except ValueError:
+        pass
+
+
+def test_compressed_index(tmp_path):
+    vectors = _make_vectors()
+    index = VectorIndex(str(tmp_path), dim=32)
+    index.add_many({f"song-{i}": vectors[2 * i:2 * i + 2] for i in range(100)}, "ckpt")
+    compressed_index = CompressedIndex.build(index, EmbeddingCompressor(dim=8).fit(vectors))
+    loaded = CompressedIndex(str(tmp_path))
+    assert loaded.codes.dtype == np.int8
+    assert loaded.is_current(index)
+    assert loaded.search(vectors[6:7], k=1)[0][0][0] == "song-3"
+    assert [song_id for song_id, _ in compressed_index.search(vectors[:10], k=1)[0]] == ["song-0"]
+    index.remove("song-0")
+    assert not loaded.is_current(index)
+
+
+def test_compressed_index_not_built(tmp_path):
+    try:
+        CompressedIndex(str(tmp_path))
+        assert False
+    except ValueError:
+        pass
@@ -0,0 +1,22 @@
+import os
+import shutil
+
+from src.main.index.sync import sync_midi_dir
+from src.main.index.vector_index import VectorIndex
+from src.main.util import init_midibert_student, root_dir
+
+midi_dir: str = os.path.join(root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", "train", "midi")
+
+
+def test_sync_midi_dir_canonicalize(tmp_path):
+    song_dir = tmp_path / "midi"
+    song_dir.mkdir()
+    for file in ["435.mid", "524.mid"]:
+        shutil.copy(os.path.join(midi_dir, file), song_dir / file)
+    model = init_midibert_student(num_layers=1, hidden_dim=64, num_heads=2)
+    index = VectorIndex(str(tmp_path / "index"), dim=model.hidden_size)
+    assert sync_midi_dir(index, str(song_dir), model, "ckpt")["added"] == 2
+    assert sync_midi_dir(index, str(song_dir), model, "ckpt")["unchanged"] == 2
+    assert sync_midi_dir(index, str(song_dir), model, "ckpt", canonicalize=True)["updated"] == 2
+    assert all(entry["canonical"] for entry in index.files.values())
+    assert sync_midi_dir(index, str(song_dir), model, "ckpt", canonicalize=True)["unchanged"] == 2
@@ -0,0 +1,71 @@
+import numpy as np
+
+from src.main.index.vector_index import VectorIndex
+
+dim = 4
+
+
+def _unit(i: int) -> np.ndarray:
+    return np.eye(dim, dtype=np.float32)[i:i + 1]
+
+
+def test_add_and_search(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=dim)
+    index.add("a", _unit(0), "ckpt")
+    index.add("b", np.vstack([_unit(1), _unit(2)]), "ckpt")
+    assert index.search(_unit(2), k=1)[0][0][0] == "b"
+    assert [song_id for song_id, _ in index.search(_unit(0), k=5)[0]] == ["a", "b"]
+
+
+def test_remove(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=dim)
+    index.add("a", _unit(0), "ckpt")
+    index.add("b", _unit(1), "ckpt")
+    index.remove("a")
+    assert "a" not in index
+    assert [song_id for song_id, _ in index.search(_unit(0), k=5)[0]] == ["b"]
+
+
+def test_remove_nonexistent(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=dim)
+    try:
+        index.remove("a")
+        assert False
+    except KeyError:
+        pass
+
+
+def test_update_is_append_only(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=dim)
+    index.add("a", _unit(0), "ckpt")
+    index.update("a", _unit(3), "ckpt")
+    assert len(index.shards) == 2
+    song_ids, vectors = index.vectors()
+    assert list(song_ids) == ["a"]
+    assert np.array_equal(vectors, _unit(3))
+
+
+def test_compact(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=dim)
+    index.add("a", _unit(0), "ckpt")
+    index.add("b", _unit(1), "ckpt")
+    index.update("a", _unit(2), "ckpt")
+    index.remove("b")
+    index.compact()
+    assert len(index.shards) == 1
+    assert index.shards[0]["num_vectors"] == 1
+    assert index.tombstones == {}
+    # a removed song can be added again after compaction
+    index.add("b", _unit(1), "ckpt")
+    assert sorted(index.vectors()[0]) == ["a", "b"]
+
+
+def test_reopen(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=dim)
+    index.add("a", _unit(0), "ckpt", content_hash="1234")
+    index.remove("a")
+    index.add("b", _unit(1), "ckpt-2", content_hash="5678")
+    reopened = VectorIndex(str(tmp_path), dim=dim)
+    assert list(reopened.vectors()[0]) == ["b"]
+    assert reopened.files["b"] == {"hash": "5678", "checkpoint": "ckpt-2", "canonical": False}
+    assert [shard["checkpoint"] for shard in reopened.shards] == ["ckpt", "ckpt-2"]
@@ -4,7 +4,7 @@ import numpy as np
 import torch
 
 from src.main.data import pad, midi_to_tuple
-from src.main.util import load_midibert, root_dir
+from src.main.util import init_midibert_student, load_midibert, root_dir
 
 
 def test_midibert_forward():
@@ -26,3 +26,13 @@ def test_midibert_forward_midi():
     example_seq = torch.tensor(pad([first_seq, second_seq])).to(dtype=torch.int32)
     model = load_midibert()
     print(model(example_seq))
+
+
+def test_midibert_student_forward():
+    example_seq = torch.tensor(pad([
+        np.array([(1, 0, 59, 8), (0, 4, 59, 8), (0, 8, 59, 8)]),
+        np.array([(1, 0, 59, 8), (0, 14, 59, 8)])
+    ])).to(dtype=torch.int32)
+    model = init_midibert_student()
+    assert model(example_seq).shape == (2, 768)
+    assert model.bertConfig.hidden_size < 768
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+
+from src.main.data import midi_to_windows
+from src.main.index import encode_windows
+from src.main.serve import InferenceServer
+from src.main.util import init_midibert_student, root_dir
+
+
+def test_inference_server_encode_files():
+    model = init_midibert_student(num_layers=1, hidden_dim=64, num_heads=2)
+    model.eval()
+    path = os.path.join(root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", "train", "midi")
+    file_paths = [os.path.join(path, file) for file in ["435.mid", "524.mid", "100005.mid"]]
+    with InferenceServer(model, num_workers=2, num_parse_workers=1) as server:
+        vectors = server.encode_files(file_paths)
+    assert len(vectors) == 3
+    assert len(vectors[2]) == 0
+    for file_path, file_vectors in zip(file_paths, vectors):
+        assert np.allclose(file_vectors, encode_windows(model, midi_to_windows(file_path)), atol=1e-5)
+
+
+def test_inference_server_parse_failure():
+    model = init_midibert_student(num_layers=1, hidden_dim=64, num_heads=2)
+    model.eval()
+    path = os.path.join(root_dir, "dataset", "mono-midi-transposition-dataset", "midi_files", "train", "midi")
+    with InferenceServer(model, num_workers=1, num_parse_workers=1) as server:
+        try:
+            server.encode_files([os.path.join(path, "435.mid"), os.path.join(path, "nonexistent.mid")])
+            assert False
+        except FileNotFoundError:
+            pass
+        file_path = os.path.join(path, "524.mid")
+        vectors = server.encode_files([file_path])
+    assert np.allclose(vectors[0], encode_windows(model, midi_to_windows(file_path)), atol=1e-5)
+
+
+def test_inference_server_encode_failure():
+    model = init_midibert_student(num_layers=1, hidden_dim=64, num_heads=2)
+    model.eval()
+    with InferenceServer(model, num_workers=1, num_parse_workers=1) as server:
+        try:
+            server.encode_windows([np.zeros(shape=(1, 8, 3), dtype=np.int32)])
+            assert False
+        except IndexError:
+            pass
+        vectors = server.encode_windows([np.zeros(shape=(1, 8, 4), dtype=np.int32)])
+    assert vectors[0].shape == (1, model.hidden_size)
@@ -0,0 +1,32 @@
+import torch
+
+from src.main.util.prefetch import PrefetchLoader
+
+pairs: torch.Tensor = torch.arange(10 * 2 * 3 * 4, dtype=torch.int32).view(10, 2, 3, 4)
+
+
+def test_prefetch_loader():
+    loader = PrefetchLoader(pairs, batch_size=4, num_workers=0)
+    batches = list(loader)
+    assert len(batches) == len(loader) == 3
+    original = torch.vstack([batch[0] for batch in batches])
+    transpose = torch.vstack([batch[1] for batch in batches])
+    assert original.dtype == torch.long
+    assert torch.equal(original, pairs[:, 0].long())
+    assert torch.equal(transpose, pairs[:, 1].long())
+    assert len(loader.wait_times) == len(loader)
+
+
+def test_prefetch_loader_workers():
+    loader = PrefetchLoader(pairs, batch_size=4, num_workers=2)
+    for _ in range(2):
+        original = torch.vstack([batch[0] for batch in loader])
+        assert torch.equal(original, pairs[:, 0].long())
+
+
+def test_prefetch_loader_early_stop():
+    loader = PrefetchLoader(pairs, batch_size=1, num_workers=0, num_prefetch_batches=1)
+    for _ in loader:
+        break
+    assert len(loader.wait_times) == 1
+    assert len(list(loader)) == len(pairs)